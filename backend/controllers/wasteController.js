@@ -49,6 +49,20 @@ exports.createWasteLog = async (req, res) => {
     });
 
     await wasteLog.save();
+
+    // The outcome updates the ML service's calibration for this restaurant and item
+    axios.post(`${ML_SERVICE_URL}/feedback`, {
+      restaurantId: String(userId),
+      itemName: wasteLog.itemName,
+      category: wasteLog.category,
+      dayOfWeek: wasteLog.dayOfWeek,
+      mealPeriod: wasteLog.mealPeriod,
+      weather: wasteLog.weather || 'cloudy',
+      specialEvent: wasteLog.specialEvent,
+      preparedQuantity: wasteLog.preparedQuantity,
+      wastedQuantity: wasteLog.wastedQuantity,
+      date: new Date(wasteLog.date).toISOString().split('T')[0]
+    }, { timeout: 5000 }).catch(err => console.warn('ML feedback failed:', err.message));
   
     const analytics = await getAnalyticsData(userId, 30);
 
@@ -269,6 +283,7 @@ exports.getWastePrediction = async (req, res) => {
     }
 
     const response = await axios.post(`${ML_SERVICE_URL}/predict`, {
+      restaurantId: String(req.user.id),
       itemName,
       category,
       dayOfWeek: dayOfWeek || new Date().toLocaleDateString('en-US', { weekday: 'long' }),
@@ -295,38 +310,6 @@ exports.getWastePrediction = async (req, res) => {
   }
 };
 
-async function getRestaurantCalibrationFactor(userId, itemName) {
-  try {
-    
-    
-    const logs = await WasteLog.find({
-      restaurant: userId,
-      itemName: itemName
-    })
-    .sort({ date: -1 })  
-    .limit(20);          
-    if (logs.length < 10) {
-      return 1.0;  
-    }
-  
-    const actualWaste = logs.reduce((sum, log) => 
-      sum + (log.wastedQuantity / log.preparedQuantity) * 100, 0
-    ) / logs.length;
-    
-    const mlBaseline = 24;    
-    const calibrationFactor = actualWaste / mlBaseline;
-
-    
-    console.log(`Calibration for ${itemName}: ML baseline=${mlBaseline}%, Restaurant actual=${actualWaste.toFixed(1)}%, Factor=${calibrationFactor.toFixed(2)}`);
-
-    return Math.max(0.3, Math.min(2.0, calibrationFactor));
-
-  } catch (error) {
-    console.error('Calibration calculation error:', error);
-    return 1.0;  
-  }
-}
-
 // Get smart suggestions for waste reduction
 exports.getSmartSuggestions = async (req, res) => {
   try {
@@ -391,7 +374,7 @@ exports.getSmartSuggestions = async (req, res) => {
     }
 
     const adjustedAvgSold = avgSold * dayOfWeekAdjustment;    
-    const calibrationFactor = await getRestaurantCalibrationFactor(userId, itemName);
+    let calibrationApplied = false;
     let recommendedQty = Math.round(adjustedAvgSold * 1.1);  
     let mlConfidence = 'data-driven';
     let predictedWaste = Math.round(avgWaste * 10) / 10;  
@@ -405,36 +388,32 @@ exports.getSmartSuggestions = async (req, res) => {
         maxSold                                 
       ];
 
-      const mlPredictions = await Promise.all(
-        scenarios.map(qty =>
-          axios.post(`${ML_SERVICE_URL}/predict`, {
-            itemName,
-            category: historicalData[0].category,
-            dayOfWeek: date
-              ? new Date(date).toLocaleDateString('en-US', { weekday: 'long' })
-              : new Date().toLocaleDateString('en-US', { weekday: 'long' }),
-            mealPeriod: historicalData[0].mealPeriod || 'all-day',
-            weather: 'cloudy',
-            specialEvent: false,
-            preparedQuantity: qty,
-            date: date || new Date().toISOString().split('T')[0]
-          }, { timeout: 5000 }).catch(() => null)  
-        )
-      );   
+      const dayOfWeek = date
+        ? new Date(date).toLocaleDateString('en-US', { weekday: 'long' })
+        : new Date().toLocaleDateString('en-US', { weekday: 'long' });
+
+      const batchResponse = await axios.post(`${ML_SERVICE_URL}/predict/batch`, {
+        inputs: scenarios.map(qty => ({
+          restaurantId: String(userId),
+          itemName,
+          category: historicalData[0].category,
+          dayOfWeek,
+          mealPeriod: historicalData[0].mealPeriod || 'all-day',
+          weather: 'cloudy',
+          specialEvent: false,
+          preparedQuantity: qty,
+          date: date || new Date().toISOString().split('T')[0]
+        }))
+      }, { timeout: 5000 }).catch(() => null);
+
+      const mlPredictions = (batchResponse?.data?.predictions || [])
+        .map(prediction => (prediction?.success ? { data: prediction } : null));
       const validPreds = mlPredictions.filter(p => p?.data);
 
       if (validPreds.length > 0) {
         
-        validPreds.forEach(pred => {
-          if (pred?.data?.wastePercentage) {
-            
-            const original = pred.data.wastePercentage;
-            
-            pred.data.wastePercentage = original * calibrationFactor;
-            
-            console.log(`  Calibrated ML prediction: ${original.toFixed(1)}% -> ${pred.data.wastePercentage.toFixed(1)}%`);
-          }
-        });
+        // The ML service already applied this restaurant's calibration
+        calibrationApplied = validPreds.some(pred => pred.data.calibration);
 
         const optimal = validPreds.reduce((best, pred) => {
           
@@ -486,7 +465,7 @@ exports.getSmartSuggestions = async (req, res) => {
         peakDemand: maxSold,
         recentWasteRate: Math.round(recentWasteRate * 10) / 10,
         mlPredictedWaste: predictedWaste.toFixed(1),
-        calibrationApplied: calibrationFactor !== 1.0  
+        calibrationApplied
       }
     });
 
@@ -0,0 +1,18 @@
+"""
+Atomic File Writes
+Replaces small state files (the registry's CURRENT pointer, calibration
+snapshots) so readers in other processes see either the old or the new
+contents, never a partial write. Standard library only, so light tools can
+import it without pulling in the serving stack.
+"""
+
+import os
+
+def write_atomic(path, text):
+    """Write text to a staging file, fsync it and rename it over path."""
+    staging = f"{path}.tmp{os.getpid()}"
+    with open(staging, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(staging, path)
@@ -0,0 +1,207 @@
+"""
+Offline Bulk Scoring
+Scores a planning file (CSV, or Parquet with pyarrow installed) with the same
+model version, encoders and item matching the service uses. The file is read
+in chunks, chunks are scored in a process pool and written to a CSV in input
+order, and a checkpoint after every chunk lets an interrupted run resume.
+
+Columns: itemName and preparedQuantity are required; category, dayOfWeek,
+mealPeriod (default all-day), weather (default cloudy), specialEvent and date
+(YYYY-MM-DD, default --month) are optional.
+
+Usage: python bulk_score.py plan.csv scored.csv [--chunk-size 100000] [--workers 4] [--resume]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from feature_encoding import (CATEGORICAL_FEATURES, FEATURE_COLUMNS, MONTH_INDEX, MONTH_SEASONS, QUANTITY_INDEX,
+                              SPECIAL_EVENT_INDEX)
+from item_matcher import PREDICTION_TYPES
+from model_registry import REGISTRY_DIR, ModelRegistry
+from prediction_table import TABLE_DIR
+from serving_artifacts import ENCODER_PATH, MODEL_PATH, SERVING_DIR
+
+DEFAULTS = {'category': None, 'dayOfWeek': None, 'mealPeriod': 'all-day', 'weather': 'cloudy'}
+
+# Set in each worker process by _init_worker
+_bundle = None
+_month = None
+_matches = {}
+
+def _init_worker(version, month):
+    global _bundle, _month
+    registry = ModelRegistry(REGISTRY_DIR, MODEL_PATH, ENCODER_PATH, SERVING_DIR, TABLE_DIR)
+    _bundle, _ = registry.load(version)
+    _month = month
+
+def _match(name, category):
+    key = (name, category)
+    if key not in _matches:
+        _matches[key] = _bundle.matcher.match(name, category)
+    return _matches[key]
+
+def score_chunk(chunk):
+    """Encode and score one DataFrame chunk; returns it with the output columns added."""
+    tables = _bundle.encoders.tables
+    n = len(chunk)
+    columns = {col: chunk[col] if col in chunk else pd.Series([default] * n, index=chunk.index)
+               for col, default in DEFAULTS.items()}
+
+    # Unknown item names are resolved once per (name, category) like the service does
+    items = chunk['itemName'].astype(object).where(chunk['itemName'].notna(), None)
+    prediction_type = np.full(n, 'item-based', dtype=object)
+    matched = np.full(n, None, dtype=object)
+    unknown = ~items.isin(list(tables['itemName'])).to_numpy()
+    if unknown.any():
+        resolved = [_match(name, category) for name, category in
+                    zip(items[unknown], columns['category'][unknown])]
+        matched[unknown] = [item for item, _, _ in resolved]
+        prediction_type[unknown] = [PREDICTION_TYPES[kind] for _, _, kind in resolved]
+        items = items.copy()
+        items[unknown] = matched[unknown]
+    columns['itemName'] = items
+
+    if 'date' in chunk:
+        month = pd.to_datetime(chunk['date'], format='%Y-%m-%d', errors='coerce').dt.month.to_numpy()
+    else:
+        month = np.full(n, float(_month))
+    quantity = pd.to_numeric(chunk['preparedQuantity'], errors='coerce').to_numpy(dtype=np.float64)
+    if 'specialEvent' in chunk:
+        special = chunk['specialEvent'].astype(str).str.lower().isin(['true', '1']).to_numpy()
+    else:
+        special = np.zeros(n, dtype=bool)
+
+    valid = ~np.isnan(month) & np.isfinite(quantity)
+    month = np.where(valid, month, 1).astype(np.int64)
+    season_codes = np.array([-1] + [tables['season'][MONTH_SEASONS[m]] for m in range(1, 13)])
+
+    X = np.empty((n, len(FEATURE_COLUMNS)))
+    for idx, col in enumerate(CATEGORICAL_FEATURES[:-1]):
+        X[:, idx] = columns[col].map(tables[col]).fillna(-1).to_numpy(dtype=np.float64)
+    X[:, CATEGORICAL_FEATURES.index('season')] = season_codes[month]
+    X[:, SPECIAL_EVENT_INDEX] = special
+    X[:, MONTH_INDEX] = month
+    X[:, QUANTITY_INDEX] = quantity
+
+    waste = np.full(n, np.nan)
+    if valid.any():
+        waste[valid] = _bundle.predict_rows(X[valid])
+
+    result = chunk.copy()
+    result['wastePercentage'] = np.round(waste, 2)
+    result['suggestedQuantity'] = pd.array(np.trunc(quantity * (1 - waste / 100)), dtype='Int64')
+    result['predictionType'] = np.where(valid, prediction_type, None)
+    result['matchedItem'] = matched
+    result['error'] = np.where(valid, None, 'invalid preparedQuantity or date')
+    return result
+
+def read_chunks(path, chunk_size):
+    if path.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit('Reading Parquet needs pyarrow (pip install pyarrow)')
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+def load_checkpoint(path, args):
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint['input'] != os.path.abspath(args.input) or checkpoint['chunkSize'] != args.chunk_size:
+        raise SystemExit('Checkpoint was written for a different input or chunk size; run without --resume')
+    return checkpoint
+
+def save_checkpoint(path, checkpoint):
+    staging = path + '.tmp'
+    with open(staging, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(staging, path)
+
+def bulk_score(args):
+    checkpoint_path = args.output + '.progress.json'
+    checkpoint = {'input': os.path.abspath(args.input), 'chunkSize': args.chunk_size,
+                  'modelVersion': None, 'chunks': 0, 'rows': 0, 'outputBytes': 0}
+    if args.resume and os.path.exists(checkpoint_path):
+        checkpoint = load_checkpoint(checkpoint_path, args)
+        print(f"Resuming after {checkpoint['chunks']} chunks ({checkpoint['rows']:,} rows)")
+    elif os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    _init_worker(checkpoint['modelVersion'] or args.version, args.month)
+    # A resumed run keeps scoring with the version it started on
+    checkpoint['modelVersion'] = _bundle.version
+    print(f"Scoring with model version {_bundle.version}, {args.workers} worker(s)")
+
+    executor = None
+    if args.workers > 1:
+        executor = ProcessPoolExecutor(args.workers, initializer=_init_worker,
+                                       initargs=(_bundle.version, args.month))
+
+    mode = 'r+b' if checkpoint['chunks'] else 'wb'
+    if mode == 'r+b' and not os.path.exists(args.output):
+        raise SystemExit(f'{args.output} is missing; run without --resume')
+    started = time.perf_counter()
+    rows_scored = 0
+
+    with open(args.output, mode) as out:
+        # Drop anything written after the last checkpoint
+        out.truncate(checkpoint['outputBytes'])
+        out.seek(checkpoint['outputBytes'])
+
+        def write(result):
+            nonlocal rows_scored
+            out.write(result.to_csv(index=False, header=checkpoint['chunks'] == 0).encode())
+            out.flush()
+            os.fsync(out.fileno())
+            checkpoint['chunks'] += 1
+            checkpoint['rows'] += len(result)
+            checkpoint['outputBytes'] = out.tell()
+            save_checkpoint(checkpoint_path, checkpoint)
+            rows_scored += len(result)
+            elapsed = time.perf_counter() - started
+            print(f"  {checkpoint['rows']:,} rows | {rows_scored / elapsed:,.0f} rows/sec")
+
+        # At most two chunks per worker are in flight, so memory stays bounded
+        # and results are written in input order
+        pending = deque()
+        chunks = read_chunks(args.input, args.chunk_size)
+        for index, chunk in enumerate(chunks):
+            if index < checkpoint['chunks']:
+                continue
+            if executor is None:
+                write(score_chunk(chunk))
+                continue
+            pending.append(executor.submit(score_chunk, chunk))
+            if len(pending) >= 2 * args.workers:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+
+    if executor is not None:
+        executor.shutdown()
+    os.remove(checkpoint_path)
+    elapsed = time.perf_counter() - started
+    print(f"Scored {rows_scored:,} rows in {elapsed:.1f}s ({rows_scored / max(elapsed, 1e-9):,.0f} rows/sec) -> {args.output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score a planning file with the waste model')
+    parser.add_argument('input', help='CSV or .parquet planning file')
+    parser.add_argument('output', help='CSV file to write')
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--version', help='registry version to use (default: CURRENT)')
+    parser.add_argument('--month', type=int, default=datetime.now().month,
+                        help='month for rows without a date column')
+    parser.add_argument('--resume', action='store_true', help='continue an interrupted run')
+    bulk_score(parser.parse_args())
@@ -0,0 +1,308 @@
+"""
+Per-Restaurant Calibration
+Keeps an exponentially weighted mean of (actual - predicted) waste percentage
+for every (restaurant, item), updated in O(1) as outcomes are posted to
+/feedback, and adds it to the model's predictions for that restaurant.
+Feedback is appended to a journal that every worker process tails, so all
+workers converge on the same state. The journal is split into numbered
+segments: each periodic snapshot of the state starts a new segment and
+deletes the ones it covers, so the journal holds only the outcomes since the
+last snapshot and startup replays just that tail.
+
+Usage: python calibration_store.py --check
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from atomic_files import write_atomic
+
+SNAPSHOT_FILE = 'snapshot.json'
+# Held shared while appending and exclusively while rotating segments
+LOCK_FILE = 'journal.lock'
+SEGMENT_PATTERN = re.compile(r'^feedback-(\d{6})\.jsonl$')
+
+def segment_file(segment):
+    return f'feedback-{segment:06d}.jsonl'
+
+def _fsync_directory(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class CalibrationStore:
+    """EWMA residuals keyed by (restaurantId, itemName).
+
+    The EWMA starts at 0, so a pair with few outcomes is only partly
+    corrected: after n identical residuals r it is r * (1 - (1 - alpha)^n).
+    """
+
+    def __init__(self, directory, alpha=0.1, max_adjustment=30.0, snapshot_seconds=60.0,
+                 poll_seconds=2.0):
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self.lock_path = os.path.join(directory, LOCK_FILE)
+        self.alpha = alpha
+        self.max_adjustment = max_adjustment
+        self.snapshot_seconds = snapshot_seconds
+        self.poll_seconds = poll_seconds
+
+        # (restaurantId, itemName) -> [residual EWMA, observations]
+        self.entries = {}
+        # Journal position applied so far, and the one the last snapshot saved
+        self.segment = 0
+        self.offset = 0
+        self.snapshot_position = (0, 0)
+        self._lock = threading.Lock()
+        self._sync_pid = None
+
+    def load(self):
+        """Restore the latest snapshot, then apply the journal written since; returns the events replayed."""
+        with self._lock:
+            self._restore()
+        applied = self.sync()
+        print(f"Calibration loaded: {len(self.entries):,} restaurant items ({applied:,} journal events replayed)")
+        return applied
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, segment_file(segment))
+
+    def _segments(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(int(match.group(1)) for match in map(SEGMENT_PATTERN.match, names) if match)
+
+    @contextmanager
+    def _journal_lock(self, exclusive):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.lock_path, 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            # Closing the file releases the lock
+            yield
+
+    def _restore(self):
+        # Reset to the snapshot, or to the oldest segment without one; the caller holds self._lock
+        self.entries, self.offset = {}, 0
+        segments = self._segments()
+        self.segment = segments[0] if segments else 0
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+            entries = {(restaurant, item): [residual, count]
+                       for restaurant, item, residual, count in snapshot['entries']}
+            self.entries, self.segment, self.offset = entries, snapshot['segment'], snapshot['offset']
+            # The journal behind the snapshot is gone, so residuals cannot be re-averaged
+            if snapshot['alpha'] != self.alpha:
+                print(f"Calibration snapshot was averaged with alpha={snapshot['alpha']}; "
+                      f"new outcomes use alpha={self.alpha}")
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable calibration snapshot: {e}")
+        self.snapshot_position = (self.segment, self.offset)
+
+    def _apply(self, event):
+        key = (event['restaurantId'], event['itemName'])
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = [0.0, 0]
+        entry[0] += self.alpha * (event['actual'] - event['predicted'] - entry[0])
+        entry[1] += 1
+
+    def sync(self):
+        """Apply journal lines appended since the last sync; returns how many."""
+        with self._lock:
+            applied = 0
+            while True:
+                # Segments are only added under the exclusive lock, after every
+                # append to the previous one, so a later segment means this one is complete
+                sealed = os.path.exists(self._segment_path(self.segment + 1))
+                try:
+                    with open(self._segment_path(self.segment), 'rb') as f:
+                        f.seek(self.offset)
+                        data = f.read()
+                except FileNotFoundError:
+                    if not any(segment > self.segment for segment in self._segments()):
+                        return applied
+                    # Deleted by another worker's snapshot, which covers everything in it
+                    self._restore()
+                    continue
+                # A line still being written by another process is picked up next time
+                end = data.rfind(b'\n') + 1
+                for line in data[:end].splitlines():
+                    try:
+                        self._apply(json.loads(line))
+                        applied += 1
+                    except (ValueError, KeyError, TypeError):
+                        print(f"Skipping malformed calibration event: {line[:200]!r}")
+                self.offset += end
+                if not sealed:
+                    return applied
+                self.segment, self.offset = self.segment + 1, 0
+
+    def record(self, restaurant_id, item_name, predicted, actual):
+        """Journal one outcome and return the updated (adjustment, observations)."""
+        line = json.dumps({
+            'restaurantId': restaurant_id,
+            'itemName': item_name,
+            'predicted': round(float(predicted), 4),
+            'actual': round(float(actual), 4),
+            'time': round(time.time(), 3)
+        }) + '\n'
+        with self._journal_lock(exclusive=False):
+            segments = self._segments()
+            path = self._segment_path(segments[-1] if segments else 0)
+            # One O_APPEND write per event, so lines from concurrent workers never interleave
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+        self.sync()
+        return self.adjustment(restaurant_id, item_name)
+
+    def adjustment(self, restaurant_id, item_name):
+        """(percentage points to add, observations) for a restaurant item."""
+        entry = self.entries.get((restaurant_id, item_name))
+        if entry is None:
+            return 0.0, 0
+        residual, count = entry
+        return max(-self.max_adjustment, min(self.max_adjustment, residual)), count
+
+    def snapshot(self):
+        """Save the state, start a new journal segment and delete the segments the snapshot covers."""
+        with self._journal_lock(exclusive=True):
+            # Appends are blocked, so this reads the current segment to its end
+            self.sync()
+            with self._lock:
+                if self.offset > 0:
+                    self.segment, self.offset = self.segment + 1, 0
+                    open(self._segment_path(self.segment), 'ab').close()
+                segment, offset = self.segment, self.offset
+                entries = [[restaurant, item, round(residual, 6), count]
+                           for (restaurant, item), (residual, count) in self.entries.items()]
+            write_atomic(self.snapshot_path, json.dumps({
+                'alpha': self.alpha,
+                'segment': segment,
+                'offset': offset,
+                'savedAt': round(time.time(), 3),
+                'entries': entries
+            }))
+            # Old segments go only once the snapshot replacing them is on disk
+            _fsync_directory(self.directory)
+            for old in self._segments():
+                if old < segment:
+                    try:
+                        os.remove(self._segment_path(old))
+                    except FileNotFoundError:
+                        pass
+        self.snapshot_position = (segment, offset)
+
+    def ensure_syncing(self):
+        # One sync thread per process, started lazily like the model watcher
+        if self._sync_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sync_pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name='calibration-sync', daemon=True).start()
+            self._sync_pid = os.getpid()
+
+    def _run(self):
+        last_snapshot = time.monotonic()
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                self.sync()
+                if (time.monotonic() - last_snapshot >= self.snapshot_seconds and
+                        (self.segment, self.offset) != self.snapshot_position):
+                    self.snapshot()
+                    last_snapshot = time.monotonic()
+            except OSError as e:
+                print(f"Calibration sync failed: {e}")
+
+    def stats(self):
+        return {
+            'restaurantItems': len(self.entries),
+            'alpha': self.alpha,
+            'maxAdjustment': self.max_adjustment,
+            'journalSegment': self.segment,
+            'journalOffset': self.offset,
+            'snapshotSegment': self.snapshot_position[0],
+            'snapshotOffset': self.snapshot_position[1]
+        }
+
+def check_rotation(events=1000, tail=100, seed=7):
+    """Record, snapshot and restart in a scratch directory; True if every check passes.
+
+    A restart after the snapshot must replay only the events recorded since,
+    and both it and a worker that was still reading the deleted segment must
+    end with the same state as the store that recorded every event.
+    """
+    rng = random.Random(seed)
+    outcomes = [(f'RESTAURANT_{rng.randrange(5)}', f'item {rng.randrange(20)}', rng.uniform(0, 40),
+                 rng.uniform(0, 40)) for _ in range(events)]
+    with tempfile.TemporaryDirectory() as directory:
+        store = CalibrationStore(directory)
+        store.load()
+        lagging = CalibrationStore(directory)
+        lagging.load()
+        for outcome in outcomes[:-tail]:
+            store.record(*outcome)
+        store.snapshot()
+        segments_after_snapshot = store._segments()
+        for outcome in outcomes[-tail:]:
+            store.record(*outcome)
+
+        restarted = CalibrationStore(directory)
+        replayed = restarted.load()
+        lagging.sync()
+        journal_lines = sum(1 for name in os.listdir(directory) if SEGMENT_PATTERN.match(name)
+                            for _ in open(os.path.join(directory, name)))
+
+        def same_state(other):
+            return other.entries.keys() == store.entries.keys() and all(
+                abs(other.entries[key][0] - value[0]) < 1e-5 and other.entries[key][1] == value[1]
+                for key, value in store.entries.items())
+
+        checks = [
+            ('snapshot leaves one empty segment', segments_after_snapshot == [1]),
+            (f'journal holds only the last {tail} events', journal_lines == tail),
+            (f'restart replays {tail} events', replayed == tail),
+            ('restarted state matches', same_state(restarted)),
+            ('lagging worker recovers from the snapshot', same_state(lagging)),
+        ]
+    for name, ok in checks:
+        print(f"  {name:<45} {'ok' if ok else 'FAIL'}")
+    return all(ok for _, ok in checks)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Calibration journal maintenance')
+    parser.add_argument('--check', action='store_true',
+                        help='check journal rotation and restart replay in a scratch directory')
+    args = parser.parse_args()
+    if args.check:
+        raise SystemExit(0 if check_rotation() else 1)
+    parser.print_help()
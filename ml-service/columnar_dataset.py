@@ -0,0 +1,166 @@
+"""
+Columnar Dataset Format
+A dataset directory holds one little-endian array file per column and a
+_schema.json describing each column: dictionary-encoded categories, narrow
+integers, fixed-point decimals stored as scaled integers, booleans, and dates
+as int32 days since 1970-01-01. Readers load only the columns they ask for.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+SCHEMA_FILE = '_schema.json'
+# Rows parsed at a time when typed columns are read from a CSV
+CSV_CHUNK_ROWS = 200000
+
+def category(categories, dtype='int16'):
+    return {'type': 'category', 'dtype': dtype, 'categories': list(categories)}
+
+def integer(dtype='int32'):
+    return {'type': 'int', 'dtype': dtype}
+
+def decimal(places, dtype='int32'):
+    """Values with a fixed number of decimal places, stored as integers scaled by 10**places."""
+    return {'type': 'decimal', 'dtype': dtype, 'places': places}
+
+def boolean():
+    return {'type': 'bool', 'dtype': 'bool'}
+
+def date():
+    return {'type': 'date', 'dtype': 'int32'}
+
+def _storage_dtype(spec):
+    return np.dtype(spec['dtype']).newbyteorder('<')
+
+def _narrow(values, dtype, name):
+    narrowed = values.astype(dtype)
+    if not np.array_equal(narrowed, values):
+        raise ValueError(f'{name} has values that do not fit {dtype}')
+    return narrowed
+
+def encode_columns(frame, schema):
+    """Encode a DataFrame chunk into {column: array} following schema."""
+    encoded = {}
+    for name, spec in schema.items():
+        values = frame[name]
+        kind = spec['type']
+        if kind == 'category':
+            codes = pd.Categorical(values, categories=spec['categories']).codes
+            if (codes < 0).any():
+                raise ValueError(f'{name} has values outside its categories')
+            encoded[name] = _narrow(codes, spec['dtype'], name)
+        elif kind == 'decimal':
+            scaled = np.rint(values.to_numpy(dtype=np.float64) * 10 ** spec['places'])
+            encoded[name] = _narrow(scaled, spec['dtype'], name)
+        elif kind == 'date':
+            days = pd.to_datetime(values, format='%Y-%m-%d').to_numpy().astype('datetime64[D]').astype(np.int64)
+            encoded[name] = _narrow(days, spec['dtype'], name)
+        elif kind == 'bool':
+            encoded[name] = values.to_numpy(dtype=bool)
+        else:
+            encoded[name] = _narrow(values.to_numpy(), spec['dtype'], name)
+    return encoded
+
+class ColumnarWriter:
+    """Appends encoded chunks column by column; the dataset appears at path on close()."""
+
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self.rows = 0
+        self.partial_path = path + '.partial'
+        shutil.rmtree(self.partial_path, ignore_errors=True)
+        os.makedirs(self.partial_path)
+        self.files = {name: open(os.path.join(self.partial_path, name + '.bin'), 'wb') for name in schema}
+
+    def write(self, encoded):
+        for name, f in self.files.items():
+            f.write(encoded[name].astype(_storage_dtype(self.schema[name]), copy=False).tobytes())
+        self.rows += len(encoded[next(iter(self.files))])
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        with open(os.path.join(self.partial_path, SCHEMA_FILE), 'w') as f:
+            json.dump({'rows': self.rows, 'columns': self.schema}, f, indent=1)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.rename(self.partial_path, self.path)
+
+def read_schema(path):
+    with open(os.path.join(path, SCHEMA_FILE)) as f:
+        return json.load(f)
+
+def load_columns(path, columns=None):
+    """DataFrame of the requested columns (default: all).
+
+    Categories come back as pandas Categoricals, decimals as float64, dates
+    as datetime64 and integers in their stored width.
+    """
+    schema = read_schema(path)['columns']
+    columns = list(columns or schema)
+    unknown = [name for name in columns if name not in schema]
+    if unknown:
+        raise ValueError(f'Unknown columns: {unknown}')
+
+    data = {}
+    for name in columns:
+        spec = schema[name]
+        raw = np.fromfile(os.path.join(path, name + '.bin'), dtype=_storage_dtype(spec))
+        kind = spec['type']
+        if kind == 'category':
+            data[name] = pd.Categorical.from_codes(raw, spec['categories'])
+        elif kind == 'decimal':
+            data[name] = raw / 10 ** spec['places']
+        elif kind == 'date':
+            data[name] = raw.astype('datetime64[D]').astype('datetime64[ns]')
+        else:
+            data[name] = raw.astype(spec['dtype'], copy=False)
+    return pd.DataFrame(data, columns=columns)
+
+def columnar_path_for(csv_path):
+    return os.path.splitext(csv_path)[0]
+
+def _use_columnar(csv_path):
+    # The columnar copy is used when it is at least as new as the CSV
+    schema_path = os.path.join(columnar_path_for(csv_path), SCHEMA_FILE)
+    return os.path.exists(schema_path) and (
+        not os.path.exists(csv_path) or os.path.getmtime(schema_path) >= os.path.getmtime(csv_path))
+
+def _read_csv_typed(csv_path, columns, categorical, dates, chunk_rows):
+    # Chunks parse the named columns as Categoricals and datetime64, and their
+    # categories are unioned, so the CSV's strings are never all held at once
+    chunks = list(pd.read_csv(csv_path, usecols=columns, chunksize=chunk_rows, parse_dates=list(dates),
+                              dtype={name: 'category' for name in categorical}))
+    if len(chunks) < 2:
+        return chunks[0] if chunks else pd.read_csv(csv_path, usecols=columns, nrows=0)
+    data = {}
+    for name in list(chunks[0].columns):
+        parts = [chunk.pop(name) for chunk in chunks]
+        data[name] = union_categoricals(parts) if name in categorical else pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(data)
+
+def read_dataset(csv_path, columns=None, categorical=(), dates=()):
+    """Load columns from the dataset's columnar copy when it is at least as new as the CSV, else from the CSV.
+
+    The columnar copy returns categories as Categoricals and dates as
+    datetime64. From a CSV, the columns named in categorical and dates are
+    parsed into the same types; the rest come back as pandas infers them.
+    """
+    if _use_columnar(csv_path):
+        return load_columns(columnar_path_for(csv_path), columns)
+    if categorical or dates:
+        return _read_csv_typed(csv_path, columns, categorical, dates, CSV_CHUNK_ROWS)
+    return pd.read_csv(csv_path, usecols=columns)
+
+def dataset_files(csv_path, columns=None):
+    """The files read_dataset(csv_path, columns) reads."""
+    if not _use_columnar(csv_path):
+        return [csv_path]
+    path = columnar_path_for(csv_path)
+    columns = columns or read_schema(path)['columns']
+    return [os.path.join(path, SCHEMA_FILE)] + [os.path.join(path, name + '.bin') for name in columns]
@@ -0,0 +1,203 @@
+"""
+Model Distillation
+Trains small gradient-boosted students on the served (teacher) model's
+predictions over the synthetic feature space: the training split plus contexts
+drawn uniformly across items, days, meal periods, weather and months. Each
+student is compared with the teacher on the held-out split of the training
+script (same seed), and the smallest one within the accuracy budget can be
+published to the model registry as the serving model.
+
+Usage: python distill_model.py [--students 40x4,80x5,150x6] [--max-r2-drop 0.005] [--publish]
+"""
+
+import argparse
+import json
+import os
+import pickle
+import time
+import warnings
+
+import joblib
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from feature_encoding import CATEGORICAL_FEATURES, FEATURE_COLUMNS, MONTH_INDEX, MONTH_SEASONS, SPECIAL_EVENT_INDEX
+from feature_pipeline import encode_features, read_source, split_arrays
+from model_registry import REGISTRY_DIR, publish_version
+from tree_engine import FlatTreeEnsemble, latency_percentiles
+
+warnings.filterwarnings('ignore')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, 'data', 'restaurant_waste_expanded.csv')
+TEACHER_PATH = os.path.join(BASE_DIR, 'models', 'waste_prediction_model_gb.pkl')
+ENCODER_PATH = os.path.join(BASE_DIR, 'models', 'feature_encoders.pkl')
+OUTPUT_DIR = os.path.join(BASE_DIR, 'models', 'distilled')
+
+def load_dataset(encoders):
+    """Encoded feature matrix and target, encoded with the teacher's encoders."""
+    X, y, _ = encode_features(read_source(CSV_PATH), encoders, consume=True)
+    return X, y
+
+def sample_contexts(X_train, encoders, n_rows, seed=42):
+    """Random contexts over the encoded feature space.
+
+    Items keep their category and draw preparedQuantity from that item's
+    training rows; the other features are uniform over their classes.
+    """
+    rng = np.random.default_rng(seed)
+    order = np.argsort(X_train[:, 0], kind='stable')
+    by_item = X_train[order]
+    items, starts, counts = np.unique(by_item[:, 0], return_index=True, return_counts=True)
+
+    picks = rng.integers(len(items), size=n_rows)
+    source = by_item[starts[picks] + (rng.random(n_rows) * counts[picks]).astype(np.int64)]
+    months = rng.integers(1, 13, size=n_rows)
+    season_codes = encoders['season'].transform([MONTH_SEASONS[m] for m in range(1, 13)])
+
+    X = source.copy()
+    for idx, col in enumerate(CATEGORICAL_FEATURES[2:5], start=2):
+        X[:, idx] = rng.integers(len(encoders[col].classes_), size=n_rows)
+    X[:, 5] = season_codes[months - 1]
+    X[:, SPECIAL_EVENT_INDEX] = rng.random(n_rows) < X_train[:, SPECIAL_EVENT_INDEX].mean()
+    X[:, MONTH_INDEX] = months
+    return X
+
+def parse_students(spec):
+    """(n_estimators, max_depth) candidates, smallest node budget (trees x 2^depth) first."""
+    students = []
+    for part in spec.split(','):
+        n_estimators, max_depth = part.lower().split('x')
+        students.append((int(n_estimators), int(max_depth)))
+    return sorted(students, key=lambda student: (student[0] * 2 ** student[1], student))
+
+def measure(model, X_test, y_test, teacher_test, repeats):
+    """Accuracy, size, load time and latency of a fitted sklearn model."""
+    flat = FlatTreeEnsemble.from_sklearn(model)
+    predictions = flat.predict(X_test)
+    serialized = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+
+    start = time.perf_counter()
+    pickle.loads(serialized)
+    load_seconds = time.perf_counter() - start
+
+    sklearn_p50, sklearn_p99 = latency_percentiles(model.predict, X_test, repeats)
+    flat_p50, flat_p99 = latency_percentiles(flat.predict, X_test, repeats)
+    return {
+        'trees': flat.n_trees,
+        'nodes': len(flat.value),
+        'maxDepth': flat.max_depth,
+        'testR2': round(r2_score(y_test, predictions), 4),
+        'testMAE': round(mean_absolute_error(y_test, predictions), 3),
+        'testRMSE': round(float(np.sqrt(mean_squared_error(y_test, predictions))), 3),
+        # Agreement with the teacher on the held-out split, in percentage points
+        'teacherMAE': round(mean_absolute_error(teacher_test, predictions), 3),
+        'teacherMaxAbsDiff': round(float(np.max(np.abs(teacher_test - predictions))), 3),
+        'teacherR2': round(r2_score(teacher_test, predictions), 4),
+        'pickleBytes': len(serialized),
+        'servingBytes': sum(getattr(flat, name).nbytes for name in ('feature', 'threshold', 'children', 'value', 'roots')),
+        'pickleLoadMs': round(load_seconds * 1000, 2),
+        'singleRowMs': {
+            'sklearnP50': round(sklearn_p50, 4), 'sklearnP99': round(sklearn_p99, 4),
+            'flatP50': round(flat_p50, 4), 'flatP99': round(flat_p99, 4)
+        }
+    }
+
+def print_row(name, result):
+    latency = result['singleRowMs']
+    print(f"  {name:<10} R² {result['testR2']:.4f} | vs teacher MAE {result['teacherMAE']:.3f}pp "
+          f"max {result['teacherMaxAbsDiff']:.2f}pp | {result['trees']} trees, {result['nodes']:,} nodes, "
+          f"{result['pickleBytes'] / 1e6:.2f}MB, load {result['pickleLoadMs']:.1f}ms | "
+          f"flat p50 {latency['flatP50'] * 1000:.0f}us p99 {latency['flatP99'] * 1000:.0f}us")
+
+def distill(args):
+    encoders = joblib.load(ENCODER_PATH)
+    teacher = joblib.load(args.teacher)
+    teacher_flat = FlatTreeEnsemble.from_sklearn(teacher)
+
+    X, y = load_dataset(encoders)
+    X_train, X_test, y_train, y_test = split_arrays(X, y, test_size=0.2, random_state=42)
+    X_distill = np.vstack([X_train, sample_contexts(X_train, encoders, args.synthetic_rows)])
+    y_distill = teacher_flat.predict(X_distill)
+    teacher_test = teacher_flat.predict(X_test)
+    print(f"Distillation set: {len(X_train):,} training rows + {args.synthetic_rows:,} sampled contexts")
+
+    report = {
+        'teacher': dict(measure(teacher, X_test, y_test, teacher_test, args.repeats), path=args.teacher),
+        'maxR2Drop': args.max_r2_drop,
+        'students': [],
+        'selected': None
+    }
+    print("\nTeacher vs students on the held-out split:")
+    print_row('teacher', report['teacher'])
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    selected = None
+    for n_estimators, max_depth in parse_students(args.students):
+        name = f"{n_estimators}x{max_depth}"
+        start = time.perf_counter()
+        student = GradientBoostingRegressor(
+            n_estimators=n_estimators,
+            max_depth=max_depth,
+            learning_rate=args.learning_rate,
+            min_samples_leaf=20,
+            random_state=42
+        )
+        student.fit(X_distill, y_distill)
+        result = measure(student, X_test, y_test, teacher_test, args.repeats)
+        result['name'] = name
+        result['trainSeconds'] = round(time.perf_counter() - start, 1)
+        result['r2Drop'] = round(report['teacher']['testR2'] - result['testR2'], 4)
+        result['withinBudget'] = bool(result['r2Drop'] <= args.max_r2_drop)
+        report['students'].append(result)
+        print_row(name, result)
+
+        # parse_students orders students by node budget, so the first one within budget is the smallest
+        if result['withinBudget'] and selected is None:
+            selected = name
+            joblib.dump(student, os.path.join(OUTPUT_DIR, 'waste_prediction_model_student.pkl'))
+            joblib.dump({
+                'features': FEATURE_COLUMNS,
+                'target': 'wastePercentage',
+                'algorithm': 'GradientBoosting (distilled)',
+                'teacher': teacher_flat.fingerprint(),
+                'student': name
+            }, os.path.join(OUTPUT_DIR, 'model_info_student.pkl'))
+            if not args.all:
+                break
+
+    report['selected'] = selected
+    with open(os.path.join(OUTPUT_DIR, 'distill_report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved: {os.path.join(OUTPUT_DIR, 'distill_report.json')}")
+
+    if selected is None:
+        print(f"No student within the R² budget of {args.max_r2_drop}; the teacher stays in service")
+        return report
+    print(f"Selected student {selected}: {os.path.join(OUTPUT_DIR, 'waste_prediction_model_student.pkl')}")
+    if args.publish:
+        version = publish_version(
+            REGISTRY_DIR,
+            os.path.join(OUTPUT_DIR, 'waste_prediction_model_student.pkl'),
+            ENCODER_PATH,
+            os.path.join(OUTPUT_DIR, 'model_info_student.pkl'),
+            args.version
+        )
+        print(f"Published {version} (now current)")
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Distill the served model into a smaller student')
+    parser.add_argument('--teacher', default=TEACHER_PATH)
+    parser.add_argument('--students', default='40x4,80x5,150x6',
+                        help='comma-separated TREESxDEPTH candidates; tried smallest first')
+    parser.add_argument('--learning-rate', type=float, default=0.2)
+    parser.add_argument('--synthetic-rows', type=int, default=250000)
+    parser.add_argument('--max-r2-drop', type=float, default=0.005,
+                        help='largest test R² loss against the teacher a student may have')
+    parser.add_argument('--all', action='store_true', help='evaluate every candidate, not just up to the first fit')
+    parser.add_argument('--repeats', type=int, default=2000, help='single-row predictions timed per model')
+    parser.add_argument('--publish', action='store_true', help='publish the selected student to the registry')
+    parser.add_argument('--version')
+    distill(parser.parse_args())
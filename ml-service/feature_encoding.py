@@ -0,0 +1,86 @@
+"""
+Compiled feature encoding for the waste prediction model.
+Turns the fitted LabelEncoders into plain dict lookups so requests can be
+encoded without calling LabelEncoder.transform or building DataFrames.
+"""
+
+import json
+
+import numpy as np
+
+CATEGORICAL_FEATURES = ['itemName', 'category', 'dayOfWeek', 'mealPeriod', 'weather', 'season']
+FEATURE_COLUMNS = [col + '_encoded' for col in CATEGORICAL_FEATURES] + [
+    'specialEvent_encoded', 'month', 'preparedQuantity'
+]
+
+# The season feature is derived from the month of the record's date
+MONTH_SEASONS = {
+    12: 'Winter', 1: 'Winter', 2: 'Winter',
+    3: 'Spring', 4: 'Spring', 5: 'Spring',
+    6: 'Summer', 7: 'Summer', 8: 'Summer',
+    9: 'Autumn', 10: 'Autumn', 11: 'Autumn'
+}
+
+# Dataset columns the features and the wastePercentage target are built from
+SOURCE_COLUMNS = CATEGORICAL_FEATURES[:5] + ['specialEvent', 'date', 'preparedQuantity', 'wastePercentage']
+
+# Code used for categorical values the encoders have never seen
+UNKNOWN_CODE = -1
+
+SPECIAL_EVENT_INDEX = FEATURE_COLUMNS.index('specialEvent_encoded')
+MONTH_INDEX = FEATURE_COLUMNS.index('month')
+QUANTITY_INDEX = FEATURE_COLUMNS.index('preparedQuantity')
+
+class CompiledEncoders:
+    """Hash-map view of the fitted feature encoders."""
+
+    def __init__(self, classes):
+        self.classes = {col: list(classes[col]) for col in CATEGORICAL_FEATURES}
+        self.tables = {
+            col: {label: code for code, label in enumerate(labels)}
+            for col, labels in self.classes.items()
+        }
+        self.known_items = self.tables['itemName']
+
+    @classmethod
+    def from_encoders(cls, encoders):
+        return cls({col: encoders[col].classes_.tolist() for col in CATEGORICAL_FEATURES})
+
+    @classmethod
+    def load(cls, path):
+        """Load class lists saved with save(); needs neither joblib nor sklearn."""
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.classes, f)
+
+    def code(self, col, value):
+        return self.tables[col].get(value, UNKNOWN_CODE)
+
+    def encode_into(self, out, features):
+        """Write one resolved feature dict into a preallocated row.
+
+        Returns the names of categorical features that fell back to UNKNOWN_CODE.
+        """
+        unknown = []
+        for idx, col in enumerate(CATEGORICAL_FEATURES):
+            code = self.tables[col].get(features[col], UNKNOWN_CODE)
+            if code == UNKNOWN_CODE:
+                unknown.append(col)
+            out[idx] = code
+        out[SPECIAL_EVENT_INDEX] = 1 if features['specialEvent'] else 0
+        out[MONTH_INDEX] = features['month']
+        out[QUANTITY_INDEX] = features['preparedQuantity']
+        return unknown
+
+    def encode_row(self, features):
+        row = np.empty((1, len(FEATURE_COLUMNS)), dtype=np.float64)
+        unknown = self.encode_into(row[0], features)
+        return row, unknown
+
+    def encode_rows(self, rows):
+        matrix = np.empty((len(rows), len(FEATURE_COLUMNS)), dtype=np.float64)
+        unknown = [self.encode_into(matrix[i], features) for i, features in enumerate(rows)]
+        return matrix, unknown
@@ -0,0 +1,237 @@
+"""
+Training Feature Pipeline
+Encodes the synthetic dataset into the model's feature matrix (FEATURE_COLUMNS
+order) with fitted LabelEncoders, as every training script does. The encoded
+matrix, target and encoders are cached on disk under a key hashed from the
+source files' contents and PIPELINE_VERSION, so a repeat run on unchanged data
+memory-maps the cached arrays instead of parsing and encoding again.
+load_split() returns the training and test rows as slices of one contiguous
+matrix, reordered once, rather than the two copies train_test_split makes.
+
+Usage: python feature_pipeline.py [--rebuild] [--clear]
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import ShuffleSplit
+from sklearn.preprocessing import LabelEncoder
+
+from columnar_dataset import dataset_files, read_dataset
+from feature_encoding import (CATEGORICAL_FEATURES, FEATURE_COLUMNS, MONTH_INDEX, MONTH_SEASONS, QUANTITY_INDEX,
+                              SOURCE_COLUMNS, SPECIAL_EVENT_INDEX)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, 'data', 'restaurant_waste_expanded.csv')
+CACHE_DIR = os.path.join(BASE_DIR, 'models', 'feature_cache')
+
+# Bump whenever encode_features changes what it produces
+PIPELINE_VERSION = 1
+# Cache entries kept besides the one just written
+KEEP_ENTRIES = 3
+# Season of each month, indexed by month - 1
+MONTH_SEASON_LABELS = np.array([MONTH_SEASONS[month] for month in range(1, 13)], dtype=object)
+
+def read_source(csv_path=CSV_PATH):
+    """The dataset's SOURCE_COLUMNS, with categorical columns as Categoricals and dates as datetime64."""
+    return read_dataset(csv_path, columns=SOURCE_COLUMNS, categorical=CATEGORICAL_FEATURES[:5], dates=['date'])
+
+def _code_dtype(n_classes):
+    """Narrowest signed integer type holding codes 0 to n_classes - 1."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_classes <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.int64
+
+def _label_codes(values):
+    """(codes, labels) for a column; Categoricals keep their own narrow codes."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories.to_numpy(dtype=object)
+    codes, labels = pd.factorize(values)
+    return codes, np.asarray(labels, dtype=object)
+
+def _encode_codes(col, codes, labels, encoder=None):
+    """LabelEncoder codes, and the encoder, for rows given as codes into labels.
+
+    Each distinct label is passed through the encoder once and the rows are
+    translated with a narrow lookup table, so no per-row strings are built.
+    """
+    if len(codes) and codes.min() < 0:
+        raise ValueError(f'{col} has missing values')
+    present = np.flatnonzero(np.bincount(codes, minlength=len(labels)))
+    if encoder is None:
+        encoder = LabelEncoder().fit(labels[present])
+    table = np.zeros(len(labels), dtype=_code_dtype(len(encoder.classes_)))
+    table[present] = encoder.transform(labels[present])
+    return table[codes], encoder
+
+def encode_features(df, encoders=None, consume=False):
+    """Feature matrix (float32), target and encoders for a dataset frame.
+
+    Without encoders, LabelEncoders are fitted on the frame; with them, the
+    frame is encoded using the given encoders' classes. With consume, each
+    source column is removed from df once it is encoded, so its memory can be
+    released while the matrix fills.
+    """
+    fit = encoders is None
+    encoders = {} if fit else dict(encoders)
+    column = df.pop if consume else df.__getitem__
+    months = pd.to_datetime(column('date')).dt.month.to_numpy(dtype=np.int8)
+    X = np.empty((len(df), len(FEATURE_COLUMNS)), dtype=np.float32)
+    for idx, col in enumerate(CATEGORICAL_FEATURES):
+        codes, labels = (months - 1, MONTH_SEASON_LABELS) if col == 'season' else _label_codes(column(col))
+        X[:, idx], encoders[col] = _encode_codes(col, codes, labels, None if fit else encoders[col])
+    X[:, SPECIAL_EVENT_INDEX] = column('specialEvent').map({True: 1, False: 0})
+    X[:, MONTH_INDEX] = months
+    X[:, QUANTITY_INDEX] = column('preparedQuantity')
+    return X, column('wastePercentage').to_numpy(dtype=np.float64), encoders
+
+def extend_encoders(encoders, df):
+    """Copies of fitted encoders with the frame's unseen classes appended; returns (encoders, added).
+
+    New classes get the next codes rather than their sorted position, so
+    every existing code, and any model trained on it, keeps its meaning.
+    """
+    seasons = pd.to_datetime(df['date']).dt.month.map(MONTH_SEASONS)
+    extended, added = {}, {}
+    for col in CATEGORICAL_FEATURES:
+        encoder = copy.deepcopy(encoders[col])
+        values = seasons if col == 'season' else df[col]
+        known = set(encoder.classes_)
+        new = sorted(value for value in pd.unique(values) if value not in known)
+        if new:
+            encoder.classes_ = np.concatenate([encoder.classes_.astype(object), np.array(new, dtype=object)])
+            added[col] = new
+        extended[col] = encoder
+    return extended, added
+
+def cache_key(csv_path=CSV_PATH):
+    """Hash of the pipeline version and the contents of the files the dataset is read from."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([PIPELINE_VERSION, SOURCE_COLUMNS, FEATURE_COLUMNS]).encode())
+    for path in dataset_files(csv_path, SOURCE_COLUMNS):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def _write_entry(path, X, y, encoders, meta):
+    partial_path = path + '.partial'
+    shutil.rmtree(partial_path, ignore_errors=True)
+    os.makedirs(partial_path)
+    np.save(os.path.join(partial_path, 'X.npy'), X)
+    np.save(os.path.join(partial_path, 'y.npy'), y)
+    joblib.dump(encoders, os.path.join(partial_path, 'encoders.pkl'))
+    with open(os.path.join(partial_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(partial_path, path)
+
+def _prune(cache_dir, keep):
+    entries = sorted(
+        (entry for entry in os.scandir(cache_dir) if entry.is_dir() and not entry.name.endswith('.partial')),
+        key=lambda entry: entry.stat().st_mtime, reverse=True
+    )
+    for entry in entries[keep + 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+def _load_arrays(csv_path, cache_dir, use_cache):
+    started = time.perf_counter()
+    key = cache_key(csv_path) if use_cache else None
+    path = os.path.join(cache_dir, key) if key else None
+
+    if path and os.path.exists(os.path.join(path, 'meta.json')):
+        X = np.load(os.path.join(path, 'X.npy'), mmap_mode='r')
+        y = np.load(os.path.join(path, 'y.npy'), mmap_mode='r')
+        encoders = joblib.load(os.path.join(path, 'encoders.pkl'))
+        print(f"Loaded {len(X):,} encoded records from the feature cache ({key[:12]}) "
+              f"in {time.perf_counter() - started:.2f}s")
+        return X, y, encoders
+
+    print(f"Loading dataset from: {csv_path}")
+    X, y, encoders = encode_features(read_source(csv_path), consume=True)
+    print(f"Encoded {len(X):,} records with {len(encoders['itemName'].classes_)} unique items "
+          f"in {time.perf_counter() - started:.2f}s")
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_entry(path, X, y, encoders, {
+            'pipelineVersion': PIPELINE_VERSION,
+            'source': os.path.abspath(csv_path),
+            'rows': len(X),
+            'features': FEATURE_COLUMNS,
+            'createdAt': time.strftime('%Y-%m-%dT%H:%M:%S')
+        })
+        _prune(cache_dir, KEEP_ENTRIES)
+        print(f"Feature cache written: {path}")
+        # Hand back the written arrays memory-mapped, as on a cache hit
+        X = np.load(os.path.join(path, 'X.npy'), mmap_mode='r')
+        y = np.load(os.path.join(path, 'y.npy'), mmap_mode='r')
+    return X, y, encoders
+
+def load_features(csv_path=CSV_PATH, cache_dir=CACHE_DIR, use_cache=True):
+    """(X, y, encoders) for the dataset, from the cache when the source data is unchanged.
+
+    X is a DataFrame with FEATURE_COLUMNS and y a wastePercentage Series; when
+    the cache is used both are backed by read-only memory-mapped arrays.
+    """
+    X, y, encoders = _load_arrays(csv_path, cache_dir, use_cache)
+    return pd.DataFrame(X, columns=FEATURE_COLUMNS, copy=False), pd.Series(y, name='wastePercentage'), encoders
+
+def split_order(n_rows, test_size=0.2, random_state=42):
+    """(order, n_train): train_test_split's training row indices followed by its test row indices."""
+    train, test = next(ShuffleSplit(test_size=test_size, random_state=random_state).split(np.empty((n_rows, 0))))
+    return np.concatenate([train, test]), len(train)
+
+def split_arrays(X, y, test_size=0.2, random_state=42, rows=None):
+    """The split train_test_split(X[rows], y[rows], ...) makes, as views on one reordered copy.
+
+    rows (indices or a boolean mask) restricts the split to a subset. X is
+    read once, in training-then-test order, so X_train and X_test are
+    contiguous slices of a single array rather than two separate copies.
+    """
+    if rows is None:
+        order, n_train = split_order(len(X), test_size, random_state)
+    else:
+        rows = np.asarray(rows)
+        rows = np.flatnonzero(rows) if rows.dtype == bool else rows
+        order, n_train = split_order(len(rows), test_size, random_state)
+        order = rows[order]
+    X, y = np.asarray(X)[order], np.asarray(y)[order]
+    return X[:n_train], X[n_train:], y[:n_train], y[n_train:]
+
+def load_split(csv_path=CSV_PATH, test_size=0.2, random_state=42, rows=None, cache_dir=CACHE_DIR, use_cache=True):
+    """(X_train, X_test, y_train, y_test, encoders) for the dataset, split as train_test_split would.
+
+    The four are DataFrame/Series views on one float32 matrix and one target
+    array (see split_arrays); the cached arrays are read once and released.
+    """
+    X, y, encoders = _load_arrays(csv_path, cache_dir, use_cache)
+    X_train, X_test, y_train, y_test = split_arrays(X, y, test_size, random_state, rows)
+    del X, y
+    return (pd.DataFrame(X_train, columns=FEATURE_COLUMNS, copy=False),
+            pd.DataFrame(X_test, columns=FEATURE_COLUMNS, copy=False),
+            pd.Series(y_train, name='wastePercentage'), pd.Series(y_test, name='wastePercentage'), encoders)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build or clear the encoded feature cache')
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--rebuild', action='store_true', help='drop the entry for the current data and re-encode')
+    parser.add_argument('--clear', action='store_true', help='remove every cache entry')
+    args = parser.parse_args()
+
+    if args.clear:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        print(f"Removed {CACHE_DIR}")
+    else:
+        if args.rebuild:
+            shutil.rmtree(os.path.join(CACHE_DIR, cache_key(args.csv)), ignore_errors=True)
+        load_features(args.csv)
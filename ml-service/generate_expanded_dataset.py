@@ -2,6 +2,23 @@
 Expanded Restaurant Waste Dataset Generator
 Generates comprehensive training data with 200+ diverse food items
 for better model generalization across different restaurant types.
+
+Rows are drawn as NumPy arrays per restaurant, each restaurant from its own
+seed stream, and streamed to the CSV in fixed-size chunks, so memory stays
+flat however many restaurants and months are requested. With --workers the
+restaurants are generated as shards in a process pool and written in order;
+the file is byte-identical for any worker count. The original row-by-row
+generator is kept as the reference (--legacy), and --check compares the two
+statistically.
+
+Alongside the CSV a typed columnar copy is written (see columnar_dataset.py):
+categorical columns dictionary-encoded against categories known up front,
+quantities and prices as narrow integers and the date as a date, which the
+training scripts load column by column instead of parsing the CSV.
+
+Usage: python generate_expanded_dataset.py [--months 12] [--restaurants 10] [--seed 42]
+       [--workers 4] [--end-date 2025-10-30] [--chunk-rows 100000] [--output path.csv]
+       [--no-columnar] [--legacy | --check | --convert]
 """
 
 import pandas as pd
@@ -9,9 +26,11 @@ import numpy as np
 from datetime import datetime, timedelta
 import random
 import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-np.random.seed(42)
-random.seed(42)
+import columnar_dataset
 
 MENU_ITEMS = {
     'meal': [
@@ -80,6 +99,22 @@ PRICE_RANGES = {
     'sides': (2, 6)
 }
 
+SEASON_WASTE_FACTORS = {'Winter': 1.1, 'Spring': 1.0, 'Summer': 0.9, 'Autumn': 1.0}
+CATEGORY_WASTE_FACTORS = {
+    'meal': 1.0, 'snack': 0.8, 'bakery': 1.3,
+    'beverages': 0.7, 'desserts': 1.2, 'sides': 0.9
+}
+BASE_QUANTITIES = {
+    'meal': (40, 60), 'snack': (30, 50), 'bakery': (50, 80),
+    'beverages': (30, 50), 'desserts': (20, 40), 'sides': (30, 50)
+}
+SEASON_QUANTITY_MULTIPLIERS = {'Winter': 0.9, 'Spring': 1.0, 'Summer': 1.2, 'Autumn': 1.0}
+MEAL_PERIODS = {
+    'bakery': ['breakfast', 'all-day'],
+    'meal': ['lunch', 'dinner'],
+    'desserts': ['lunch', 'dinner', 'all-day']
+}
+
 def get_season(date):
     month = date.month
     if month in [12, 1, 2]: return 'Winter'
@@ -112,28 +147,16 @@ def calculate_waste_percentage(day_of_week, weather, special_event, category, se
     if special_event or is_holiday:
         base_waste *= 1.4
     
-    season_factors = {'Winter': 1.1, 'Spring': 1.0, 'Summer': 0.9, 'Autumn': 1.0}
-    base_waste *= season_factors[season]
-    
-    category_factors = {
-        'meal': 1.0, 'snack': 0.8, 'bakery': 1.3,
-        'beverages': 0.7, 'desserts': 1.2, 'sides': 0.9
-    }
-    base_waste *= category_factors.get(category, 1.0)
+    base_waste *= SEASON_WASTE_FACTORS[season]
+    base_waste *= CATEGORY_WASTE_FACTORS.get(category, 1.0)
     base_waste *= random.uniform(0.8, 1.2)
     
     return min(base_waste, 0.45)
 
 def generate_quantities(day_of_week, category, season, is_holiday):
-    base_quantities = {
-        'meal': (40, 60), 'snack': (30, 50), 'bakery': (50, 80),
-        'beverages': (30, 50), 'desserts': (20, 40), 'sides': (30, 50)
-    }
-    
-    min_qty, max_qty = base_quantities.get(category, (30, 50))
+    min_qty, max_qty = BASE_QUANTITIES.get(category, (30, 50))
     
-    season_multipliers = {'Winter': 0.9, 'Spring': 1.0, 'Summer': 1.2, 'Autumn': 1.0}
-    multiplier = season_multipliers[season]
+    multiplier = SEASON_QUANTITY_MULTIPLIERS[season]
     min_qty = int(min_qty * multiplier)
     max_qty = int(max_qty * multiplier)
     
@@ -153,8 +176,11 @@ def generate_quantities(day_of_week, category, season, is_holiday):
     
     return random.randint(min_qty, max_qty)
 
-def generate_expanded_dataset(num_months=12, num_restaurants=10):
+def generate_expanded_dataset(num_months=12, num_restaurants=10, seed=42):
     print(f"Generating expanded dataset: {num_months} months, {num_restaurants} restaurants")
+    # Seeded per call rather than at import, so importing MENU_ITEMS leaves the global generators alone
+    random.seed(seed)
+    np.random.seed(seed)
     
     end_date = datetime.now()
     start_date = end_date - timedelta(days=num_months * 30)
@@ -179,12 +205,8 @@ def generate_expanded_dataset(num_months=12, num_restaurants=10):
                     special_event = random.random() < special_event_prob
                     weather = get_weather_for_season(season)
                     
-                    if category == 'bakery':
-                        meal_period = random.choice(['breakfast', 'all-day'])
-                    elif category == 'meal':
-                        meal_period = random.choice(['lunch', 'dinner'])
-                    elif category == 'desserts':
-                        meal_period = random.choice(['lunch', 'dinner', 'all-day'])
+                    if category in MEAL_PERIODS:
+                        meal_period = random.choice(MEAL_PERIODS[category])
                     else:
                         meal_period = 'all-day'
                     
@@ -235,20 +257,397 @@ def generate_expanded_dataset(num_months=12, num_restaurants=10):
     
     return df
 
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+SEASONS = ['Winter', 'Spring', 'Summer', 'Autumn']
+WEATHER_TYPES = ['sunny', 'rainy', 'cloudy', 'snowy']
+CATEGORIES = list(MENU_ITEMS)
+COLUMNS = [
+    'restaurant_id', 'itemName', 'category', 'date', 'dayOfWeek', 'preparedQuantity',
+    'soldQuantity', 'wastedQuantity', 'wastePercentage', 'mealPeriod', 'weather',
+    'specialEvent', 'revenue', 'potentialRevenueLoss', 'notes'
+]
+
+# The per-value factors of calculate_waste_percentage and generate_quantities as arrays
+DAY_WASTE = np.array([1.3, 1.0, 1.0, 1.0, 1.0, 0.8, 0.8])
+DAY_QUANTITY = np.array([0.7, 1.0, 1.0, 1.0, 1.3, 1.3, 1.1])
+WEATHER_WASTE = np.array([0.9, 1.2, 1.0, 1.4])
+WEATHER_CDF = np.cumsum([[WEATHER_BY_SEASON[season][w] for w in WEATHER_TYPES] for season in SEASONS], axis=1)
+SEASON_WASTE = np.array([SEASON_WASTE_FACTORS[season] for season in SEASONS])
+SEASON_QUANTITY = np.array([SEASON_QUANTITY_MULTIPLIERS[season] for season in SEASONS])
+CATEGORY_WASTE = np.array([CATEGORY_WASTE_FACTORS[c] for c in CATEGORIES])
+CATEGORY_QUANTITY = np.array([BASE_QUANTITIES[c] for c in CATEGORIES], dtype=np.float64)
+CATEGORY_PRICE = np.array([PRICE_RANGES[c] for c in CATEGORIES], dtype=np.float64)
+
+def build_calendar(num_months, end_date=None):
+    """Per-day arrays shared by every restaurant."""
+    end_date = end_date or datetime.now()
+    start_date = end_date - timedelta(days=num_months * 30)
+    dates = pd.date_range(start=start_date, end=end_date, freq='D')
+    strings = dates.strftime('%Y-%m-%d')
+    return {
+        'date': np.asarray(strings, dtype=object),
+        'day': np.asarray(dates.dayofweek),
+        'season': np.asarray(dates.month % 12 // 3),
+        'holiday': np.asarray(strings.isin(UK_BANK_HOLIDAYS))
+    }
+
+def generate_restaurant(restaurant_id, calendar, rng):
+    """One restaurant's rows, drawn as arrays; same schema and distributions as the loop."""
+    n_days = len(calendar['date'])
+    names, categories = [], []
+    for category_idx, (category, items) in enumerate(MENU_ITEMS.items()):
+        picked = rng.choice(len(items), size=min(len(items), max(3, len(items) - 2)), replace=False)
+        names.extend(items[i] for i in picked)
+        categories.extend([category_idx] * len(picked))
+    names = np.array(names, dtype=object)
+    categories = np.array(categories)
+
+    # Rows are item-major then by date, as in the loop; 15% of item-days are skipped
+    kept = np.flatnonzero(rng.random(len(names) * n_days) >= 0.15)
+    item, day_idx = np.divmod(kept, n_days)
+    n = len(kept)
+    category = categories[item]
+    day = calendar['day'][day_idx]
+    season = calendar['season'][day_idx]
+    holiday = calendar['holiday'][day_idx]
+
+    special_event = rng.random(n) < np.where(holiday, 0.15, 0.05)
+    weather = (rng.random(n)[:, None] >= WEATHER_CDF[season]).sum(axis=1)
+    weather = np.minimum(weather, len(WEATHER_TYPES) - 1)
+
+    meal_period = np.full(n, 'all-day', dtype=object)
+    for name, periods in MEAL_PERIODS.items():
+        rows = np.flatnonzero(category == CATEGORIES.index(name))
+        meal_period[rows] = np.array(periods, dtype=object)[rng.integers(len(periods), size=len(rows))]
+
+    # int() after every multiplier, as generate_quantities does
+    bounds = np.floor(CATEGORY_QUANTITY[category] * SEASON_QUANTITY[season][:, None])
+    bounds = np.floor(bounds * DAY_QUANTITY[day][:, None])
+    bounds = np.floor(bounds * np.where(holiday, 1.4, 1.0)[:, None])
+    prepared = rng.integers(bounds[:, 0].astype(np.int64), bounds[:, 1].astype(np.int64) + 1)
+
+    waste = 0.15 * DAY_WASTE[day] * WEATHER_WASTE[weather]
+    waste = waste * np.where(special_event | holiday, 1.4, 1.0)
+    waste = waste * SEASON_WASTE[season] * CATEGORY_WASTE[category]
+    waste = np.minimum(waste * rng.uniform(0.8, 1.2, n), 0.45)
+
+    wasted = np.floor(prepared * waste).astype(np.int64)
+    sold = prepared - wasted
+    price = np.round(rng.uniform(CATEGORY_PRICE[category, 0], CATEGORY_PRICE[category, 1]), 2)
+
+    notes = np.array([[[f'Generated for {name} on {d}' + (' (Bank Holiday)' if h else '')
+                        for h in (False, True)] for d in DAY_NAMES] for name in names], dtype=object)
+    return pd.DataFrame({
+        'restaurant_id': f'RESTAURANT_{restaurant_id}',
+        'itemName': names[item],
+        'category': np.array(CATEGORIES, dtype=object)[category],
+        'date': calendar['date'][day_idx],
+        'dayOfWeek': np.array(DAY_NAMES, dtype=object)[day],
+        'preparedQuantity': prepared,
+        'soldQuantity': sold,
+        'wastedQuantity': wasted,
+        'wastePercentage': np.round(waste * 100, 2),
+        'mealPeriod': meal_period,
+        'weather': np.array(WEATHER_TYPES, dtype=object)[weather],
+        'specialEvent': special_event | holiday,
+        'revenue': np.round(sold * price, 2),
+        'potentialRevenueLoss': np.round(wasted * price, 2),
+        'notes': notes[item, day, holiday.astype(np.int64)]
+    }, columns=COLUMNS)
+
+def restaurant_rng(seed, restaurant_id):
+    # Each restaurant draws from its own stream, so its rows do not depend on the others
+    return np.random.default_rng([seed, restaurant_id])
+
+def generate_vectorized_dataset(num_months=12, num_restaurants=10, seed=42, end_date=None):
+    """Array-based equivalent of generate_expanded_dataset."""
+    print(f"Generating expanded dataset (vectorized): {num_months} months, {num_restaurants} restaurants")
+    calendar = build_calendar(num_months, end_date)
+    df = pd.concat([
+        generate_restaurant(restaurant_id, calendar, restaurant_rng(seed, restaurant_id))
+        for restaurant_id in range(1, num_restaurants + 1)
+    ], ignore_index=True)
+
+    print("\nDataset generated successfully")
+    print(f"Total records: {len(df):,}")
+    print(f"Date range: {df['date'].min()} to {df['date'].max()}")
+    print(f"Unique items: {df['itemName'].nunique()}")
+    print(f"Categories: {df['category'].nunique()}")
+    return df
+
+def iter_dataset_chunks(num_months=12, num_restaurants=10, seed=42, end_date=None, chunk_rows=100000):
+    """Yield the vectorized dataset as DataFrames of chunk_rows rows (the last may be shorter).
+
+    Only the restaurant being generated and one partial chunk are in memory at a time.
+    """
+    calendar = build_calendar(num_months, end_date)
+    pending, pending_rows = [], 0
+    for restaurant_id in range(1, num_restaurants + 1):
+        frame = generate_restaurant(restaurant_id, calendar, restaurant_rng(seed, restaurant_id))
+        pending.append(frame)
+        pending_rows += len(frame)
+        while pending_rows >= chunk_rows:
+            merged = pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+            yield merged.iloc[:chunk_rows]
+            pending = [merged.iloc[chunk_rows:]]
+            pending_rows = len(pending[0])
+    if pending_rows:
+        yield pd.concat(pending, ignore_index=True)
+
+class DatasetSummary:
+    """Summary statistics accumulated chunk by chunk."""
+
+    def __init__(self):
+        self.records = 0
+        self.date_min = None
+        self.date_max = None
+        self.items = set()
+        self.category_counts = {}
+        self.sample_items = {}
+
+    @classmethod
+    def of(cls, chunk):
+        summary = cls()
+        summary.update(chunk)
+        return summary
+
+    def merge(self, other):
+        """Fold in the summary of the rows that follow this one's."""
+        self.records += other.records
+        if other.date_min is not None:
+            self.date_min = other.date_min if self.date_min is None else min(self.date_min, other.date_min)
+            self.date_max = other.date_max if self.date_max is None else max(self.date_max, other.date_max)
+        self.items |= other.items
+        for category, count in other.category_counts.items():
+            self.category_counts[category] = self.category_counts.get(category, 0) + count
+        for category, items in other.sample_items.items():
+            samples = self.sample_items.setdefault(category, [])
+            samples.extend(item for item in items if item not in samples)
+            del samples[5:]
+
+    def update(self, chunk):
+        self.records += len(chunk)
+        # ISO date strings order like the dates themselves
+        date_min, date_max = chunk['date'].min(), chunk['date'].max()
+        self.date_min = date_min if self.date_min is None else min(self.date_min, date_min)
+        self.date_max = date_max if self.date_max is None else max(self.date_max, date_max)
+        self.items.update(chunk['itemName'].unique())
+        for category, count in chunk['category'].value_counts(sort=False).items():
+            self.category_counts[category] = self.category_counts.get(category, 0) + count
+        for category, item in chunk[['category', 'itemName']].drop_duplicates().itertuples(index=False):
+            samples = self.sample_items.setdefault(category, [])
+            if len(samples) < 5 and item not in samples:
+                samples.append(item)
+
+    def report(self):
+        print("\nDataset generated successfully")
+        print(f"Total records: {self.records:,}")
+        print(f"Date range: {self.date_min} to {self.date_max}")
+        print(f"Unique items: {len(self.items)}")
+        print(f"Categories: {len(self.category_counts)}")
+
+        print("\nCategory distribution:")
+        for category, count in sorted(self.category_counts.items(), key=lambda entry: -entry[1]):
+            print(f"{category:<12}{count:>10,}")
+
+        print("\nSample items per category:")
+        for category, items in self.sample_items.items():
+            print(f"{category}: {', '.join(items)}")
+
+def dataset_schema(num_restaurants, restaurant_ids=None):
+    """Columnar schema of the dataset; every category is known before any row is drawn.
+
+    restaurant_ids replaces the generated RESTAURANT_1..N names, for CSVs that already exist.
+    """
+    if restaurant_ids is None:
+        restaurant_ids = [f'RESTAURANT_{i}' for i in range(1, num_restaurants + 1)]
+    notes = [f'Generated for {name} on {day}' + suffix
+             for items in MENU_ITEMS.values() for name in items
+             for day in DAY_NAMES for suffix in ('', ' (Bank Holiday)')]
+    meal_periods = sorted({'all-day'}.union(*MEAL_PERIODS.values()))
+    return {
+        'restaurant_id': columnar_dataset.category(
+            restaurant_ids, 'int16' if len(restaurant_ids) < 2 ** 15 else 'int32'
+        ),
+        'itemName': columnar_dataset.category([name for items in MENU_ITEMS.values() for name in items]),
+        'category': columnar_dataset.category(CATEGORIES, 'int8'),
+        'date': columnar_dataset.date(),
+        'dayOfWeek': columnar_dataset.category(DAY_NAMES, 'int8'),
+        'preparedQuantity': columnar_dataset.integer('int16'),
+        'soldQuantity': columnar_dataset.integer('int16'),
+        'wastedQuantity': columnar_dataset.integer('int16'),
+        'wastePercentage': columnar_dataset.decimal(2, 'int16'),
+        'mealPeriod': columnar_dataset.category(meal_periods, 'int8'),
+        'weather': columnar_dataset.category(WEATHER_TYPES, 'int8'),
+        'specialEvent': columnar_dataset.boolean(),
+        'revenue': columnar_dataset.decimal(2, 'int32'),
+        'potentialRevenueLoss': columnar_dataset.decimal(2, 'int32'),
+        'notes': columnar_dataset.category(notes)
+    }
+
+def format_chunk(chunk, schema=None):
+    """CSV rows (no header), summary and, given a schema, the encoded columns of a chunk."""
+    encoded = columnar_dataset.encode_columns(chunk, schema) if schema else None
+    return chunk.to_csv(header=False, index=False), DatasetSummary.of(chunk), encoded
+
+def generate_shard(restaurant_id, num_months, seed, end_date, schema=None):
+    """One restaurant formatted by format_chunk; runs in the worker processes."""
+    calendar = build_calendar(num_months, end_date)
+    return format_chunk(generate_restaurant(restaurant_id, calendar, restaurant_rng(seed, restaurant_id)), schema)
+
+def iter_shards(num_months, num_restaurants, seed, end_date, workers, schema=None):
+    """Formatted restaurants from a process pool, in restaurant order.
+
+    A restaurant's rows depend only on (seed, restaurant_id) and the dates,
+    so the output is the same for any number of workers. At most two shards
+    per worker are in flight.
+    """
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for restaurant_id in range(1, num_restaurants + 1):
+            pending.append(executor.submit(generate_shard, restaurant_id, num_months, seed, end_date, schema))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def write_dataset(parts, output_path, schema=None):
+    """Append formatted (csv_text, summary, encoded) parts to a CSV and return the merged summary.
+
+    Given a schema, the encoded columns also go to the columnar copy next to
+    the CSV. Both are written under .partial names and renamed once complete,
+    the columnar copy last so it is never older than the CSV it mirrors.
+    """
+    summary = DatasetSummary()
+    partial_path = output_path + '.partial'
+    columnar = None
+    if schema:
+        columnar = columnar_dataset.ColumnarWriter(columnar_dataset.columnar_path_for(output_path), schema)
+    started = time.perf_counter()
+    with open(partial_path, 'w', newline='') as f:
+        f.write(','.join(COLUMNS) + '\n')
+        for text, part_summary, encoded in parts:
+            f.write(text)
+            if columnar:
+                columnar.write(encoded)
+            summary.merge(part_summary)
+            elapsed = time.perf_counter() - started
+            print(f"  {summary.records:,} rows written | {summary.records / elapsed:,.0f} rows/sec | "
+                  f"{f.tell() / 1e6:,.0f} MB")
+    os.replace(partial_path, output_path)
+    if columnar:
+        columnar.close()
+    return summary
+
+def csv_restaurant_ids(csv_path, chunk_rows=100000):
+    """Restaurant IDs of an existing CSV, in order of first appearance."""
+    seen = {}
+    for chunk in pd.read_csv(csv_path, usecols=['restaurant_id'], chunksize=chunk_rows):
+        seen.update(dict.fromkeys(chunk['restaurant_id'].unique()))
+    return list(seen)
+
+def convert_csv(csv_path, chunk_rows=100000):
+    """Write the columnar copy of an existing CSV.
+
+    The restaurants are read from the CSV in a first pass, since it may have been
+    generated with any --restaurants count.
+    """
+    restaurant_ids = csv_restaurant_ids(csv_path, chunk_rows)
+    schema = dataset_schema(len(restaurant_ids), restaurant_ids)
+    columnar = columnar_dataset.ColumnarWriter(columnar_dataset.columnar_path_for(csv_path), schema)
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        columnar.write(columnar_dataset.encode_columns(chunk, schema))
+    columnar.close()
+    return columnar.rows
+
+def compare_generators(num_months=6, num_restaurants=10, alpha=0.001):
+    """Two-sample tests between the loop and vectorized generators; True if none rejects."""
+    from scipy import stats
+
+    end_date = datetime.now()
+    legacy = generate_expanded_dataset(num_months, num_restaurants)
+    fast = generate_vectorized_dataset(num_months, num_restaurants, seed=7, end_date=end_date)
+    print("\nEquivalence checks (p-values; a check fails below alpha):")
+
+    passed = list(legacy.columns) == list(fast.columns) and (legacy.dtypes == fast.dtypes).all()
+    print(f"  {'schema':<40} {'same' if passed else 'DIFFERENT'}")
+    # Menus are drawn per restaurant, so item frequencies are compared as menu sizes, not rows
+    menus = [df.groupby(['restaurant_id', 'category'])['itemName'].nunique().sort_index() for df in (legacy, fast)]
+    same_menus = menus[0].equals(menus[1])
+    passed &= same_menus
+    print(f"  {'items per restaurant and category':<40} {'same' if same_menus else 'DIFFERENT'}")
+
+    results = []
+    per_restaurant = [legacy.groupby('restaurant_id').size(), fast.groupby('restaurant_id').size()]
+    results.append(('rows per restaurant (Welch t)', stats.ttest_ind(*per_restaurant, equal_var=False).pvalue))
+    for col in ['preparedQuantity', 'wastePercentage', 'soldQuantity', 'wastedQuantity', 'revenue']:
+        for category in CATEGORIES:
+            results.append((f'{col} | {category} (KS)', stats.ks_2samp(
+                legacy.loc[legacy['category'] == category, col], fast.loc[fast['category'] == category, col]
+            ).pvalue))
+    # Joint frequencies; month stands in for the date so season effects are covered
+    legacy['month'], fast['month'] = legacy['date'].str[5:7], fast['date'].str[5:7]
+    for cols in [['category'], ['dayOfWeek'], ['weather', 'month'],
+                 ['specialEvent', 'month'], ['mealPeriod', 'category']]:
+        counts = pd.concat([legacy.groupby(cols).size(), fast.groupby(cols).size()], axis=1).fillna(0)
+        results.append((f"{' x '.join(cols)} (chi-square)", stats.chi2_contingency(counts.to_numpy().T)[1]))
+
+    for name, p in results:
+        ok = p >= alpha
+        passed &= ok
+        print(f"  {name:<40} {p:8.4f}{'' if ok else '  FAIL'}")
+    print(f"\n{'Generators agree' if passed else 'Generators differ'} ({len(results)} tests, alpha={alpha})")
+    return passed
+
 if __name__ == "__main__":
-    df = generate_expanded_dataset(num_months=12, num_restaurants=10)
-    
-    print("\nCategory distribution:")
-    print(df['category'].value_counts())
-    
-    print("\nSample items per category:")
-    for category in df['category'].unique():
-        items = df[df['category'] == category]['itemName'].unique()[:5]
-        print(f"{category}: {', '.join(items)}")
-    
-    output_filename = 'restaurant_waste_expanded.csv'
-    data_dir = os.path.join(os.path.dirname(__file__), 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    output_path = os.path.join(data_dir, output_filename)
-    df.to_csv(output_path, index=False)
-    print(f"\nSaved to: {output_filename}")
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate the synthetic restaurant waste dataset')
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--restaurants', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=int, default=100000, help='rows generated and written at a time')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes generating restaurants in parallel; output is identical for any count')
+    parser.add_argument('--end-date', help='last date (YYYY-MM-DD) instead of today, for reproducible output')
+    parser.add_argument('--output', help='CSV path (default: data/restaurant_waste_expanded.csv)')
+    parser.add_argument('--no-columnar', action='store_true', help='write only the CSV, without the columnar copy')
+    parser.add_argument('--convert', action='store_true',
+                        help='only write the columnar copy of the existing CSV at --output; '
+                             'its restaurants are read from the CSV')
+    parser.add_argument('--legacy', action='store_true', help='use the original row-by-row generator')
+    parser.add_argument('--check', action='store_true',
+                        help='compare the vectorized generator with the row-by-row one and exit')
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if compare_generators() else 1)
+
+    output_path = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data',
+                                               'restaurant_waste_expanded.csv')
+    if args.convert:
+        rows = convert_csv(output_path, args.chunk_rows)
+        print(f"Wrote {rows:,} rows to {columnar_dataset.columnar_path_for(output_path)}")
+        raise SystemExit(0)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    # Fixed once here so every shard sees the same dates
+    end_date = datetime.strptime(args.end_date, '%Y-%m-%d') if args.end_date else datetime.now()
+    schema = None if args.no_columnar else dataset_schema(args.restaurants)
+    if args.legacy:
+        parts = [format_chunk(generate_expanded_dataset(args.months, args.restaurants, seed=args.seed), schema)]
+    elif args.workers > 1:
+        print(f"Generating expanded dataset: {args.months} months, {args.restaurants} restaurants "
+              f"({args.workers} workers, one shard per restaurant)")
+        parts = iter_shards(args.months, args.restaurants, args.seed, end_date, args.workers, schema)
+    else:
+        print(f"Generating expanded dataset: {args.months} months, {args.restaurants} restaurants "
+              f"(streaming {args.chunk_rows:,}-row chunks)")
+        chunks = iter_dataset_chunks(
+            args.months, args.restaurants, seed=args.seed, end_date=end_date, chunk_rows=args.chunk_rows
+        )
+        parts = (format_chunk(chunk, schema) for chunk in chunks)
+    summary = write_dataset(parts, output_path, schema)
+    summary.report()
+    print(f"\nSaved to: {output_path}")
+    if schema:
+        print(f"Columnar copy: {columnar_dataset.columnar_path_for(output_path)}")
@@ -0,0 +1,42 @@
+"""
+Gunicorn Settings for the ML Prediction Service
+The app is imported once in the master process (preload_app), so the model,
+encoders and prediction table are loaded before the workers fork and their
+memory is shared copy-on-write instead of being duplicated per worker.
+
+Usage: gunicorn -c gunicorn.conf.py ml_service:app
+Graceful restart of all workers: kill -HUP <master pid>
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+
+workers = int(os.environ.get('ML_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('ML_THREADS', 4))
+worker_class = 'gthread'
+# With ML_BACKGROUND_LOAD=1 each worker loads the model itself after the port
+# opens; the mapped serving artifacts are still shared through the page cache
+preload_app = os.environ.get('ML_BACKGROUND_LOAD') != '1'
+
+# Seconds a request may run before its worker is killed and replaced
+timeout = int(os.environ.get('ML_REQUEST_TIMEOUT', 30))
+# Seconds in-flight requests get to finish on restart or shutdown
+graceful_timeout = int(os.environ.get('ML_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers after this many requests (0 disables)
+max_requests = int(os.environ.get('ML_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before any worker forks.
+    # Freezing moves the loaded model out of the collector's view, so garbage
+    # collection in the workers does not write to (and un-share) its pages.
+    gc.freeze()
+    server.log.info(f"Model preloaded, starting {server.cfg.workers} workers x {server.cfg.threads} threads")
@@ -0,0 +1,121 @@
+"""
+Fuzzy Item Matching
+Resolves item names the encoders have never seen to the closest known item by
+character-trigram similarity, or to a representative item of the requested
+category when nothing is close enough. Both lookups use tables built once.
+"""
+
+import re
+import unicodedata
+from itertools import product
+
+import numpy as np
+
+from feature_encoding import FEATURE_COLUMNS, MONTH_INDEX, MONTH_SEASONS, QUANTITY_INDEX
+
+# Dice similarity a trigram match needs before it is used instead of the category representative
+MIN_MATCH_SCORE = 0.5
+
+# Prediction type reported for each kind of match
+PREDICTION_TYPES = {'exact': 'item-based', 'fuzzy': 'fuzzy-match', 'category': 'category-based'}
+
+def normalize(name):
+    """Lowercase ASCII words, so 'Crème  Brûlée' and 'creme brulee' compare equal."""
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode()
+    return ' '.join(re.findall(r'[a-z0-9]+', name.lower()))
+
+def trigrams(name):
+    padded = f'  {normalize(name)} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def rank_representatives(model, encoders, item_categories, quantity=50):
+    """Order each category's items by how typical their predicted waste is.
+
+    Every item is scored over all days, meal periods and months; the first
+    representative of a category is the item whose mean prediction is closest
+    to the category median. The '*' entry ranks all items.
+    """
+    tables = encoders.tables
+    items = [item for item in encoders.classes['itemName'] if item in item_categories]
+    contexts = list(product(range(len(tables['dayOfWeek'])), range(len(tables['mealPeriod'])), range(1, 13)))
+    weather = tables['weather'].get('cloudy', 0)
+
+    X = np.zeros((len(items) * len(contexts), len(FEATURE_COLUMNS)))
+    for i, item in enumerate(items):
+        rows = X[i * len(contexts):(i + 1) * len(contexts)]
+        rows[:, 0] = tables['itemName'][item]
+        rows[:, 1] = tables['category'][item_categories[item]]
+        rows[:, 2:4] = [context[:2] for context in contexts]
+        rows[:, 4] = weather
+        rows[:, 5] = [tables['season'][MONTH_SEASONS[context[2]]] for context in contexts]
+        rows[:, MONTH_INDEX] = [context[2] for context in contexts]
+    X[:, QUANTITY_INDEX] = quantity
+    means = dict(zip(items, model.predict(X).reshape(len(items), len(contexts)).mean(axis=1)))
+
+    groups = {'*': items}
+    for item in items:
+        groups.setdefault(item_categories[item], []).append(item)
+    representatives = {}
+    for category, members in groups.items():
+        median = np.median([means[item] for item in members])
+        representatives[category] = sorted(members, key=lambda item: (abs(means[item] - median), item))
+    return representatives
+
+class ItemMatcher:
+    """Trigram index over known item names plus per-category representatives."""
+
+    def __init__(self, known_items, item_categories=None, representatives=None):
+        self.items = list(known_items)
+        self.item_categories = item_categories or {}
+        self.representatives = representatives or {'*': self.items}
+        self.normalized = {normalize(item): item for item in self.items}
+
+        self.sizes = []
+        self.index = {}
+        for item_id, item in enumerate(self.items):
+            grams = trigrams(item)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                self.index.setdefault(gram, []).append(item_id)
+
+    def nearest(self, name, category=None):
+        """(item, Dice score) of the closest known item, preferring the given category."""
+        grams = trigrams(name)
+        shared = {}
+        for gram in grams:
+            for item_id in self.index.get(gram, ()):
+                shared[item_id] = shared.get(item_id, 0) + 1
+
+        best, best_key = None, None
+        for item_id, count in shared.items():
+            score = 2 * count / (len(grams) + self.sizes[item_id])
+            item = self.items[item_id]
+            # A good enough match in the requested category beats closer ones elsewhere
+            in_category = self.item_categories.get(item) == category and score >= MIN_MATCH_SCORE
+            key = (in_category, score)
+            if best_key is None or key > best_key:
+                best, best_key = (item, score), key
+        return best or (None, 0.0)
+
+    def match(self, name, category=None):
+        """Resolve an unknown item name.
+
+        Returns (item, score, kind) where kind is 'exact', 'fuzzy' or
+        'category'; category matches carry the name's score against the
+        representative.
+        """
+        if name is not None:
+            exact = self.normalized.get(normalize(name))
+            if exact is not None:
+                return exact, 1.0, 'exact'
+            item, score = self.nearest(name, category)
+            if item is not None and score >= MIN_MATCH_SCORE:
+                return item, score, 'fuzzy'
+
+        members = self.representatives.get(category) or self.representatives['*']
+        representative = members[0]
+        score = 0.0
+        if name is not None:
+            grams, target = trigrams(name), trigrams(representative)
+            score = 2 * len(grams & target) / (len(grams) + len(target))
+        return representative, score, 'category'
@@ -0,0 +1,84 @@
+"""
+Process Memory Usage
+Resident set size readings for the training scripts. On Linux the peak RSS
+(VmHWM) is reset when a measured block starts, so the reported peak is the
+block's own; elsewhere it falls back to the process-lifetime peak from
+getrusage.
+"""
+
+import sys
+
+STATUS_PATH = '/proc/self/status'
+CLEAR_REFS_PATH = '/proc/self/clear_refs'
+
+def _status_bytes(field):
+    try:
+        with open(STATUS_PATH) as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def current_rss():
+    """Resident set size in bytes, or None where it cannot be read."""
+    return _status_bytes('VmRSS')
+
+def _lifetime_peak():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS mark to the current RSS; False where that is not supported."""
+    try:
+        with open(CLEAR_REFS_PATH, 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss():
+    """Peak resident set size in bytes since the last reset (or process start)."""
+    peak = _status_bytes('VmHWM')
+    return peak if peak is not None else _lifetime_peak()
+
+class PeakRSS:
+    """Context manager recording the RSS at entry and the peak RSS inside the block.
+
+    with PeakRSS() as memory:
+        model.fit(X_train, y_train)
+    print(f"Peak RSS during fit: {memory}")
+    """
+
+    def __enter__(self):
+        self.isolated = reset_peak_rss()
+        self.start = current_rss()
+        self.peak = None
+        return self
+
+    def __exit__(self, *exc_info):
+        self.peak = peak_rss()
+        return False
+
+    def as_dict(self):
+        return {
+            'startMB': None if self.start is None else round(self.start / 1e6, 1),
+            'peakMB': None if self.peak is None else round(self.peak / 1e6, 1),
+            'processPeak': not self.isolated
+        }
+
+    def __str__(self):
+        if self.peak is None:
+            return 'unavailable'
+        text = f"{self.peak / 1e6:,.0f}MB"
+        if self.start is not None:
+            text += f" (+{(self.peak - self.start) / 1e6:,.0f}MB over {self.start / 1e6:,.0f}MB at start)"
+        if not self.isolated:
+            text += ', process lifetime peak'
+        return text
@@ -0,0 +1,113 @@
+"""
+Micro-Batching Request Coalescer
+Holds single-row predictions for at most max_wait_ms (or until max_batch_size
+rows are waiting), scores them with one vectorized call and resolves each
+caller's future with its own result. A submit may name its own predict_fn
+(e.g. the model version the request started on); each batch is then scored
+per function.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.batch_sizes = {}
+
+    def _ensure_worker(self):
+        # Started lazily so the thread and its lock belong to the process that
+        # serves requests (a forked gunicorn worker), not the preloading master
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = deque()
+            self._cond = threading.Condition()
+            threading.Thread(target=self._run, name='micro-batcher', daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, row, predict_fn=None):
+        self._ensure_worker()
+        future = Future()
+        with self._cond:
+            self._queue.append((row, future, time.perf_counter(), predict_fn or self.predict_fn))
+            self._cond.notify()
+        return future
+
+    def predict(self, row, timeout=None, predict_fn=None):
+        return self.submit(row, predict_fn).result(timeout)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # The window opens when the oldest waiting request arrived
+            deadline = self._queue[0][2] + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            size = min(len(self._queue), self.max_batch_size)
+            return [self._queue.popleft() for _ in range(size)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            groups = {}
+            for entry in batch:
+                groups.setdefault(entry[3], []).append(entry)
+            for predict_fn, entries in groups.items():
+                try:
+                    predictions = predict_fn(np.vstack([row for row, _, _, _ in entries]))
+                except Exception as e:
+                    for _, future, _, _ in entries:
+                        future.set_exception(e)
+                else:
+                    for (_, future, _, _), prediction in zip(entries, predictions):
+                        future.set_result(prediction)
+            self._record(batch, started)
+
+    def _record(self, batch, started):
+        waits = [started - entry[2] for entry in batch]
+        bucket = 1 << (len(batch) - 1).bit_length()
+        with self._stats_lock:
+            self.batches += 1
+            self.rows += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.wait_total += sum(waits)
+            self.wait_max = max(self.wait_max, max(waits))
+            self.batch_sizes[bucket] = self.batch_sizes.get(bucket, 0) + 1
+
+    def stats(self):
+        return {
+            'maxBatchSize': self.max_batch_size,
+            'maxWaitMs': self.max_wait * 1000,
+            'batches': self.batches,
+            'rows': self.rows,
+            'meanBatchSize': round(self.rows / self.batches, 2) if self.batches else 0.0,
+            'largestBatch': self.largest_batch,
+            'meanQueueWaitMs': round(self.wait_total / self.rows * 1000, 3) if self.rows else 0.0,
+            'maxQueueWaitMs': round(self.wait_max * 1000, 3),
+            # Batch counts by size bucket (upper bound, powers of two)
+            'batchSizeBuckets': {str(k): v for k, v in sorted(self.batch_sizes.items())}
+        }
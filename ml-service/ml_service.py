@@ -1,126 +1,553 @@
-from flask import Flask, request, jsonify
+import time
+STARTUP_STARTED = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import joblib
-import pandas as pd
-from datetime import datetime
+import numpy as np
+import hmac
+import math
 import os
+import threading
+
+from calibration_store import CalibrationStore
+from item_matcher import PREDICTION_TYPES
+from micro_batcher import MicroBatcher
+from prediction_cache import PredictionCache
+from model_registry import ModelRegistry, read_current
+from request_validation import OrjsonProvider, is_number, orjson
+from shadow_eval import ShadowEvaluator
+from service_metrics import Counter, Gauge, Histogram, StageTimer, render
 
 app = Flask(__name__)
 CORS(app)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, 'models', 'waste_prediction_model_gb.pkl')
 ENCODER_PATH = os.path.join(BASE_DIR, 'models', 'feature_encoders.pkl')
+TABLE_PATH = os.environ.get(
+    'PREDICTION_TABLE_PATH', os.path.join(BASE_DIR, 'models', 'prediction_table')
+)
+# Memory-mappable export of the model and encoders (see serving_artifacts.py)
+SERVING_PATH = os.environ.get('ML_SERVING_PATH', os.path.join(BASE_DIR, 'models', 'serving'))
+
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 1000))
+
+prediction_cache = PredictionCache(
+    max_entries=int(os.environ.get('PREDICTION_CACHE_SIZE', 10000)),
+    ttl_seconds=float(os.environ.get('PREDICTION_CACHE_TTL', 600))
+)
+
+REQUEST_LATENCY = Histogram(
+    'ml_request_duration_seconds', 'Request latency by endpoint', ['endpoint'])
+STAGE_LATENCY = Histogram(
+    'ml_predict_stage_duration_seconds', 'Latency of each stage of /predict', ['stage'])
+PREDICTIONS = Counter(
+    'ml_predictions_total', 'Predictions served by endpoint and prediction type',
+    ['endpoint', 'prediction_type'])
+ERRORS = Counter(
+    'ml_request_errors_total', 'Responses with an error status', ['endpoint', 'status'])
+IN_FLIGHT = Gauge(
+    'ml_requests_in_flight', 'Requests currently being handled', ['endpoint'])
+
+# Publish versions with model_registry.py; without a registry the flat
+# models/ files are served. ML_ADMIN_TOKEN enables the /admin endpoints.
+REGISTRY_PATH = os.environ.get('ML_REGISTRY_PATH', os.path.join(BASE_DIR, 'models', 'registry'))
+ADMIN_TOKEN = os.environ.get('ML_ADMIN_TOKEN')
+# Cached predictions of a retired model are dropped when another one is swapped in
+model_registry = ModelRegistry(
+    REGISTRY_PATH, MODEL_PATH, ENCODER_PATH, SERVING_PATH, TABLE_PATH,
+    poll_seconds=float(os.environ.get('ML_REGISTRY_POLL_SECONDS', 5)),
+    on_swap=lambda bundle: prediction_cache.clear()
+)
+# Candidate models scored off the request path: comma-separated registry
+# versions or model .pkl paths, e.g. ML_SHADOW_MODELS=models/waste_prediction_model.pkl
+SHADOW_MODELS = [spec.strip() for spec in os.environ.get('ML_SHADOW_MODELS', '').split(',') if spec.strip()]
+shadow = ShadowEvaluator(
+    lambda: {os.path.basename(spec): model_registry.load_candidate(spec) for spec in SHADOW_MODELS},
+    max_queue=int(os.environ.get('ML_SHADOW_QUEUE', 10000)),
+    sample_rate=float(os.environ.get('ML_SHADOW_SAMPLE', 1.0))
+) if SHADOW_MODELS else None
+# Per-restaurant corrections learned from outcomes posted to /feedback
+calibration = CalibrationStore(
+    os.environ.get('ML_CALIBRATION_PATH', os.path.join(BASE_DIR, 'models', 'calibration')),
+    alpha=float(os.environ.get('ML_CALIBRATION_ALPHA', 0.1)),
+    snapshot_seconds=float(os.environ.get('ML_CALIBRATION_SNAPSHOT_SECONDS', 60))
+)
+
+# Set once a model is loaded and its warm-up prediction has gone through
+ready = threading.Event()
+
+def load_model():
+    """Load the active model version and mark the service ready."""
+    timings = {'imports': time.perf_counter() - STARTUP_STARTED}
+    print(f"Loading model version: {read_current(REGISTRY_PATH) or 'local (' + MODEL_PATH + ')'}")
+    _, load_timings = model_registry.reload()
+    timings.update(load_timings)
+    calibration.load()
+    timings['total'] = time.perf_counter() - STARTUP_STARTED
+    ready.set()
+    print("Model loaded successfully")
+    print("Startup timings: " + " | ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()))
+
+def resolve_item(features, bundle):
+    """Map an unknown itemName onto a known item in place.
+
+    Returns (confidence, prediction_type, match); match describes how the
+    name was resolved and is None for known items.
+    """
+    item_name = features['itemName']
+    if item_name in bundle.encoders.known_items:
+        return "high", "item-based", None
+
+    matched_item, score, kind = bundle.matcher.match(item_name, features['category'])
+    features['itemName'] = matched_item
+    match = {'matchedItem': matched_item, 'matchScore': round(score, 3)}
+    confidence = "high" if kind == 'exact' else "medium"
+    return confidence, PREDICTION_TYPES[kind], match
+
+def validation_error(errors):
+    return {
+        'success': False,
+        'error': '; '.join(error['message'] for error in errors),
+        'errors': errors
+    }
+
+def field_error(field, message):
+    return {'field': field, 'message': message}
+
+def calibrate(prediction, restaurant_id, item_name):
+    """Apply the restaurant's learned correction to a model prediction.
+
+    Returns (prediction, calibrated); calibrated holds the response fields
+    describing the correction and is None when none applies.
+    """
+    if restaurant_id is None:
+        return prediction, None
+    adjustment, observations = calibration.adjustment(restaurant_id, item_name)
+    if not observations:
+        return prediction, None
+    calibrated = {
+        'modelWastePercentage': round(float(prediction), 2),
+        'calibration': {'adjustment': round(adjustment, 2), 'observations': observations}
+    }
+    return min(100.0, max(0.0, prediction + adjustment)), calibrated
+
+def format_prediction(prediction, prepared_qty, confidence, prediction_type, unknown_features,
+                      match=None, warnings=None, calibrated=None):
+    suggested_qty = int(prepared_qty * (1 - prediction/100))
+    result = {
+        'success': True,
+        'wastePercentage': round(float(prediction), 2),
+        'confidence': confidence,
+        'predictionType': prediction_type,
+        'suggestedQuantity': suggested_qty,
+        'message': f'Prediction based on {prediction_type} patterns'
+    }
+    if match:
+        result.update(match)
+    if calibrated:
+        result.update(calibrated)
+    if unknown_features:
+        result['confidence'] = 'low'
+        result['unknownFeatures'] = unknown_features
+    if warnings:
+        result['warnings'] = warnings
+    return result
+
+# Concurrent single-row requests are coalesced into one model call when the
+# batching window is enabled (ML_BATCH_WINDOW_MS > 0)
+BATCH_WINDOW_MS = float(os.environ.get('ML_BATCH_WINDOW_MS', 0))
+batcher = MicroBatcher(
+    lambda rows: model_registry.current.predict_rows(rows),
+    max_batch_size=int(os.environ.get('ML_MAX_BATCH', 64)),
+    max_wait_ms=BATCH_WINDOW_MS
+) if BATCH_WINDOW_MS > 0 else None
+
+def predict_single(bundle, row):
+    # Rows are scored by the bundle the request resolved them with, even if
+    # a newer model was swapped in meanwhile
+    if batcher is not None:
+        return batcher.predict(row[0], predict_fn=bundle.predict_rows)
+    return bundle.predict_rows(row)[0]
+
+def cache_key(bundle, row):
+    return (bundle.model.fingerprint(),) + tuple(row)
 
-# Load model at startup
-print(f"Loading model from: {MODEL_PATH}")
-model = joblib.load(MODEL_PATH)
-encoders = joblib.load(ENCODER_PATH)
-print("Model loaded successfully")
-
-def get_season(month):
-    if month in [12, 1, 2]:
-        return 'Winter'
-    elif month in [3, 4, 5]:
-        return 'Spring'
-    elif month in [6, 7, 8]:
-        return 'Summer'
+def parse_sweep_quantities(data):
+    """Candidate preparedQuantity values from a list or an inclusive range.
+
+    Returns (quantities, errors); errors is a list of {field, message}.
+    """
+    if 'quantities' in data:
+        quantities = data['quantities']
+        if not isinstance(quantities, list) or not quantities:
+            return None, [field_error('quantities', 'quantities must be a non-empty list')]
+        field = 'quantities'
+    elif 'quantityRange' in data:
+        quantity_range = data['quantityRange']
+        if not isinstance(quantity_range, dict):
+            return None, [field_error('quantityRange', 'quantityRange must be an object with min, max and step')]
+        start = quantity_range.get('min')
+        stop = quantity_range.get('max')
+        step = quantity_range.get('step', 1)
+        if not all(is_number(v) and math.isfinite(v) for v in (start, stop, step)) or step <= 0 or stop < start:
+            return None, [field_error('quantityRange', 'quantityRange needs numeric min <= max and a positive step')]
+        count = int((stop - start) // step) + 1
+        if count > MAX_BATCH_SIZE:
+            return None, [field_error('quantityRange', f'Sweep size {count} exceeds limit of {MAX_BATCH_SIZE}')]
+        quantities = [start + i * step for i in range(count)]
+        field = 'quantityRange'
     else:
-        return 'Autumn'
-
-def get_category_item(category, known_items):
-    """Get representative item for category."""
-    for item in known_items:
-        if 'Burger' in item or 'Fish' in item or 'Chicken' in item:
-            if category == 'meal':
-                return item
-        if 'Chips' in item or 'Bread' in item:
-            if category == 'snack':
-                return item
-        if 'Scone' in item or 'Croissant' in item:
-            if category == 'bakery':
-                return item
-        if 'Juice' in item or 'Coffee' in item:
-            if category == 'beverages':
-                return item
-        if 'Cake' in item or 'Ice Cream' in item:
-            if category == 'desserts':
-                return item
-        if 'Salad' in item or 'Soup' in item:
-            if category == 'sides':
-                return item
-    return known_items[0]
+        return None, [field_error('quantities', 'Provide either quantities or quantityRange')]
+
+    if len(quantities) > MAX_BATCH_SIZE:
+        return None, [field_error(field, f'Sweep size {len(quantities)} exceeds limit of {MAX_BATCH_SIZE}')]
+    if not all(is_number(q) and math.isfinite(q) for q in quantities):
+        return None, [field_error(field, 'Every quantity must be a number')]
+    if any(q <= 0 for q in quantities):
+        return None, [field_error(field, 'Every quantity must be positive')]
+    return quantities, []
+
+def parse_sweep_options(data):
+    """(demand, minCoverage, maxWastePercentage, errors) for a sweep request."""
+    errors = []
+    demand = data.get('demand')
+    if demand is not None and (not is_number(demand) or not math.isfinite(demand) or demand <= 0):
+        errors.append(field_error('demand', 'demand must be a positive number'))
+    min_coverage = data.get('minCoverage', 0.9)
+    if not is_number(min_coverage) or not 0 < min_coverage <= 1:
+        errors.append(field_error('minCoverage', 'minCoverage must be a number in (0, 1]'))
+    max_waste = data.get('maxWastePercentage')
+    if max_waste is not None and (not is_number(max_waste) or not 0 <= max_waste <= 100):
+        errors.append(field_error('maxWastePercentage', 'maxWastePercentage must be a number between 0 and 100'))
+    return demand, min_coverage, max_waste, errors
 
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'healthy',
         'service': 'ML Prediction Service',
-        'model_loaded': model is not None
+        'model_loaded': model_registry.current is not None,
+        'model_version': model_registry.current.version if model_registry.current else None
+    })
+
+@app.before_request
+def start_request_metrics():
+    # Registered before require_ready so every request that is torn down was counted in
+    g.endpoint = request.endpoint or 'unmatched'
+    g.started = time.perf_counter()
+    IN_FLIGHT.inc(g.endpoint)
+
+@app.after_request
+def count_errors(response):
+    if response.status_code >= 400:
+        ERRORS.inc(g.endpoint, str(response.status_code))
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if 'started' in g:
+        IN_FLIGHT.dec(g.endpoint)
+        REQUEST_LATENCY.observe(time.perf_counter() - g.started, g.endpoint)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(
+        render([REQUEST_LATENCY, STAGE_LATENCY, PREDICTIONS, ERRORS, IN_FLIGHT]),
+        mimetype='text/plain; version=0.0.4'
+    )
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    if not ready.is_set():
+        return jsonify({'ready': False}), 503
+    return jsonify({'ready': True})
+
+@app.before_request
+def require_ready():
+    # /health answers while the model is still loading; predictions wait for /ready
+    if ready.is_set():
+        model_registry.ensure_watching()
+        calibration.ensure_syncing()
+    elif request.path.startswith(('/predict', '/feedback')):
+        return jsonify({
+            'success': False,
+            'error': 'Model is still loading'
+        }), 503
+
+def check_admin():
+    """Error response unless the request carries ML_ADMIN_TOKEN."""
+    if not ADMIN_TOKEN:
+        return jsonify({'success': False, 'error': 'Admin endpoints are disabled'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'success': False, 'error': 'Invalid admin token'}), 403
+    return None
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    denied = check_admin()
+    if denied:
+        return denied
+    version = (request.get_json(silent=True) or {}).get('version')
+    try:
+        # CURRENT is moved too, so the other workers follow through their watchers
+        bundle, timings = model_registry.reload(version, publish=True)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({
+        'success': True,
+        'model': bundle.describe(),
+        'timingsMs': {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+    })
+
+@app.route('/admin/rollback', methods=['POST'])
+def admin_rollback():
+    denied = check_admin()
+    if denied:
+        return denied
+    try:
+        bundle = model_registry.rollback()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'model': bundle.describe()})
+
+@app.route('/stats', methods=['GET'])
+def service_stats():
+    return jsonify({
+        'model': model_registry.stats(),
+        'cache': prediction_cache.stats(),
+        'batching': batcher.stats() if batcher is not None else None,
+        'shadow': shadow.stats() if shadow is not None else None,
+        'calibration': calibration.stats()
     })
 
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
-        data = request.json
-        
-        item_name = data.get('itemName')
-        category = data.get('category')
-        day_of_week = data.get('dayOfWeek')
-        meal_period = data.get('mealPeriod', 'all-day')
-        weather = data.get('weather', 'cloudy')
-        special_event = data.get('specialEvent', False)
-        prepared_qty = data.get('preparedQuantity')
-        
-        if 'date' in data:
-            date_obj = datetime.strptime(data['date'], '%Y-%m-%d')
-            month = date_obj.month
-        else:
-            month = datetime.now().month
-        
-        season = get_season(month)
-        
-        known_items = encoders['itemName'].classes_
-        
-        if item_name in known_items:
-            item_encoded = encoders['itemName'].transform([item_name])[0]
-            confidence = "high"
-            prediction_type = "item-based"
-        else:
-            category_item = get_category_item(category, known_items)
-            item_encoded = encoders['itemName'].transform([category_item])[0]
-            confidence = "medium"
-            prediction_type = "category-based"
-        
-        input_data = pd.DataFrame({
-            'itemName_encoded': [item_encoded],
-            'category_encoded': [encoders['category'].transform([category])[0]],
-            'dayOfWeek_encoded': [encoders['dayOfWeek'].transform([day_of_week])[0]],
-            'mealPeriod_encoded': [encoders['mealPeriod'].transform([meal_period])[0]],
-            'weather_encoded': [encoders['weather'].transform([weather])[0]],
-            'season_encoded': [encoders['season'].transform([season])[0]],
-            'specialEvent_encoded': [1 if special_event else 0],
-            'month': [month],
-            'preparedQuantity': [prepared_qty]
-        })
-        
-        prediction = model.predict(input_data)[0]
-        suggested_qty = int(prepared_qty * (1 - prediction/100))
-        
+        timer = StageTimer(STAGE_LATENCY)
+        bundle = model_registry.current
+        data = request.get_json(silent=True)
+        timer.mark('decode')
+        features, errors, warnings = bundle.validator.validate(data)
+        timer.mark('validate')
+        if errors:
+            return jsonify(validation_error(errors)), 400
+        item_name = features['itemName']
+        confidence, prediction_type, match = resolve_item(features, bundle)
+        timer.mark('fallback')
+        row, unknown_features = bundle.encoders.encode_row(features)
+        timer.mark('encode')
+
+        prediction = prediction_cache.get_or_compute(
+            cache_key(bundle, row[0].tolist()), lambda: predict_single(bundle, row)
+        )
+        timer.mark('inference')
+        if shadow is not None:
+            shadow.offer(row, [prediction])
+        prediction, calibrated = calibrate(prediction, features['restaurantId'], item_name)
+
+        response = jsonify(format_prediction(
+            prediction, features['preparedQuantity'], confidence, prediction_type,
+            unknown_features, match, warnings, calibrated
+        ))
+        timer.mark('serialize')
+        PREDICTIONS.inc('predict', prediction_type)
+        return response
+
+    except Exception:
+        # The validator reports bad input without raising, so anything raised here is a server fault
+        app.logger.exception('Prediction failed')
+        return jsonify({
+            'success': False,
+            'error': 'Internal error while making the prediction'
+        }), 500
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    data = request.get_json(silent=True)
+    inputs = data.get('inputs') if isinstance(data, dict) else data
+
+    if not isinstance(inputs, list) or not inputs:
         return jsonify({
+            'success': False,
+            'error': 'Request body must contain a non-empty "inputs" list'
+        }), 400
+    if len(inputs) > MAX_BATCH_SIZE:
+        return jsonify({
+            'success': False,
+            'error': f'Batch size {len(inputs)} exceeds limit of {MAX_BATCH_SIZE}'
+        }), 400
+
+    bundle = model_registry.current
+    results = [None] * len(inputs)
+    valid_rows = []
+    valid_meta = []
+
+    for idx, item in enumerate(inputs):
+        features, errors, warnings = bundle.validator.validate(item)
+        if errors:
+            results[idx] = validation_error(errors)
+            continue
+        item_name = features['itemName']
+        confidence, prediction_type, match = resolve_item(features, bundle)
+        valid_rows.append(features)
+        valid_meta.append((idx, item_name, confidence, prediction_type, match, warnings))
+
+    if valid_rows:
+        matrix, unknown = bundle.encoders.encode_rows(valid_rows)
+        keys = [cache_key(bundle, row) for row in matrix.tolist()]
+        predictions = [prediction_cache.get(key) for key in keys]
+
+        missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+        if missing:
+            for i, prediction in zip(missing, bundle.predict_rows(matrix[missing])):
+                predictions[i] = prediction
+                prediction_cache.put(keys[i], prediction)
+        if shadow is not None:
+            shadow.offer(matrix, predictions)
+
+        for features, (idx, item_name, confidence, prediction_type, match, warnings), prediction, unknown_features in zip(
+            valid_rows, valid_meta, predictions, unknown
+        ):
+            prediction, calibrated = calibrate(prediction, features['restaurantId'], item_name)
+            result = format_prediction(
+                prediction, features['preparedQuantity'], confidence, prediction_type,
+                unknown_features, match, warnings, calibrated
+            )
+            result['preparedQuantity'] = features['preparedQuantity']
+            results[idx] = result
+            PREDICTIONS.inc('batch', prediction_type)
+
+    return jsonify({
+        'success': True,
+        'count': len(results),
+        'failed': len(results) - len(valid_rows),
+        'predictions': results
+    })
+
+@app.route('/predict/sweep', methods=['POST'])
+def predict_sweep():
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify(validation_error([
+                {'field': None, 'message': 'Request body must be a JSON object'}
+            ])), 400
+        quantities, errors = parse_sweep_quantities(data)
+        if errors:
+            return jsonify(validation_error(errors)), 400
+        demand, min_coverage, max_waste, errors = parse_sweep_options(data)
+
+        # Only preparedQuantity varies, so the context is resolved and encoded once
+        bundle = model_registry.current
+        features, context_errors, warnings = bundle.validator.validate(dict(data, preparedQuantity=quantities[0]))
+        errors += context_errors
+        if errors:
+            return jsonify(validation_error(errors)), 400
+        item_name = features['itemName']
+        confidence, prediction_type, match = resolve_item(features, bundle)
+        row, unknown_features = bundle.encoders.encode_row(features)
+        breakpoints, values = bundle.quantity_step_function(row)
+        predictions = values[np.searchsorted(breakpoints, np.asarray(quantities, dtype=np.float32))]
+        adjustment, observations = calibration.adjustment(features['restaurantId'], item_name)
+        if observations:
+            predictions = np.clip(predictions + adjustment, 0.0, 100.0)
+
+        candidates = []
+        optimal = None
+        best_waste_units = None
+        for qty, prediction in zip(quantities, predictions):
+            waste_units = qty * prediction / 100
+            candidate = {
+                'preparedQuantity': qty,
+                'wastePercentage': round(float(prediction), 2),
+                'suggestedQuantity': int(qty * (1 - prediction/100)),
+                'expectedWaste': round(float(waste_units), 2)
+            }
+            if demand is not None:
+                candidate['demandCoverage'] = round(qty / demand, 3)
+            candidates.append(candidate)
+
+            if demand is not None and qty < min_coverage * demand:
+                continue
+            if max_waste is not None and prediction > max_waste:
+                continue
+            # Ties go to the larger quantity, which covers more demand
+            if (best_waste_units is None or waste_units < best_waste_units or
+                    (waste_units == best_waste_units and qty > optimal['preparedQuantity'])):
+                optimal = candidate
+                best_waste_units = waste_units
+
+        result = {
             'success': True,
-            'wastePercentage': round(prediction, 2),
-            'confidence': confidence,
+            'confidence': 'low' if unknown_features else confidence,
             'predictionType': prediction_type,
-            'suggestedQuantity': suggested_qty,
-            'message': f'Prediction based on {prediction_type} patterns'
-        })
-        
-    except Exception as e:
+            'candidates': candidates,
+            'optimal': optimal
+        }
+        if match:
+            result.update(match)
+        if observations:
+            result['calibration'] = {'adjustment': round(adjustment, 2), 'observations': observations}
+        if unknown_features:
+            result['unknownFeatures'] = unknown_features
+        if warnings:
+            result['warnings'] = warnings
+        PREDICTIONS.inc('sweep', prediction_type)
+        return jsonify(result)
+
+    except Exception:
+        # Requests are fully validated above, so anything raised here is a server fault
+        app.logger.exception('Sweep evaluation failed')
         return jsonify({
             'success': False,
-            'error': str(e)
-        }), 400
+            'error': 'Internal error while evaluating the sweep'
+        }), 500
+
+@app.route('/feedback', methods=['POST'])
+def feedback():
+    """Record the actual waste for a prediction context and update its calibration."""
+    bundle = model_registry.current
+    data = request.get_json(silent=True)
+    features, errors, warnings = bundle.validator.validate(data)
+    if not errors:
+        wasted_qty = data.get('wastedQuantity')
+        if features['restaurantId'] is None:
+            errors.append({'field': 'restaurantId', 'message': 'restaurantId is required'})
+        if features['preparedQuantity'] <= 0:
+            errors.append({'field': 'preparedQuantity', 'message': 'preparedQuantity must be positive'})
+        elif not is_number(wasted_qty) or not 0 <= wasted_qty <= features['preparedQuantity']:
+            errors.append({
+                'field': 'wastedQuantity',
+                'message': 'wastedQuantity must be a number between 0 and preparedQuantity'
+            })
+    if errors:
+        return jsonify(validation_error(errors)), 400
+
+    # Residuals are measured against the uncalibrated model, as /predict would score the context
+    item_name = features['itemName']
+    resolve_item(features, bundle)
+    row, _ = bundle.encoders.encode_row(features)
+    prediction = prediction_cache.get_or_compute(
+        cache_key(bundle, row[0].tolist()), lambda: predict_single(bundle, row)
+    )
+    actual = wasted_qty / features['preparedQuantity'] * 100
+    adjustment, observations = calibration.record(features['restaurantId'], item_name, prediction, actual)
+    return jsonify({
+        'success': True,
+        'modelWastePercentage': round(float(prediction), 2),
+        'actualWastePercentage': round(actual, 2),
+        'calibration': {'adjustment': round(adjustment, 2), 'observations': observations}
+    })
+
+# With ML_BACKGROUND_LOAD=1 the model loads in a thread, so the port opens (and
+# /health answers) at once; /ready turns 200 when loading and warm-up finish
+if os.environ.get('ML_BACKGROUND_LOAD') == '1':
+    threading.Thread(target=load_model, name='model-loader', daemon=True).start()
+else:
+    load_model()
 
 if __name__ == '__main__':
     print("ML Prediction Service Starting")
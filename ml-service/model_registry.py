@@ -0,0 +1,347 @@
+"""
+Versioned Model Registry with Hot Reload
+Each version lives in models/registry/<version>/ with the model, encoders,
+model_info_gb.pkl and a checksums.json; the CURRENT file names the active one.
+The service loads a version in the background, smoke-tests it and swaps one
+bundle reference, so in-flight requests finish on the bundle they started with.
+The previous bundle stays in memory for an instant rollback.
+
+Usage:
+  python model_registry.py publish [--version v3] [--no-activate]
+  python model_registry.py activate v2
+  python model_registry.py list
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from atomic_files import write_atomic
+from feature_encoding import FEATURE_COLUMNS, MONTH_INDEX, MONTH_SEASONS, QUANTITY_INDEX
+from item_matcher import ItemMatcher
+from request_validation import RequestValidator
+from prediction_table import PredictionTable
+from serving_artifacts import load_serving_artifacts
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, 'models')
+REGISTRY_DIR = os.path.join(MODEL_DIR, 'registry')
+
+MODEL_FILE = 'waste_prediction_model_gb.pkl'
+ENCODER_FILE = 'feature_encoders.pkl'
+INFO_FILE = 'model_info_gb.pkl'
+CHECKSUM_FILE = 'checksums.json'
+CURRENT_FILE = 'CURRENT'
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_current(registry_dir):
+    """Active version named by CURRENT, or None when there is no registry."""
+    try:
+        with open(os.path.join(registry_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def set_current(registry_dir, version):
+    if not os.path.isdir(os.path.join(registry_dir, version)):
+        raise ValueError(f'Unknown model version: {version}')
+    write_atomic(os.path.join(registry_dir, CURRENT_FILE), version + '\n')
+
+def list_versions(registry_dir):
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(registry_dir)
+        if os.path.isfile(os.path.join(registry_dir, name, CHECKSUM_FILE))
+    )
+
+def publish_version(registry_dir, model_path, encoder_path, info_path, version=None, activate=True):
+    """Copy a trained model into a new registry version and optionally make it current."""
+    version = version or datetime.now().strftime('v%Y%m%d-%H%M%S')
+    target = os.path.join(registry_dir, version)
+    if os.path.exists(target):
+        raise ValueError(f'Version {version} already exists')
+
+    staging = f"{target}.tmp{os.getpid()}"
+    os.makedirs(staging)
+    checksums = {}
+    for source, name in ((model_path, MODEL_FILE), (encoder_path, ENCODER_FILE), (info_path, INFO_FILE)):
+        shutil.copy2(source, os.path.join(staging, name))
+        checksums[name] = file_sha256(os.path.join(staging, name))
+    with open(os.path.join(staging, CHECKSUM_FILE), 'w') as f:
+        json.dump(checksums, f, indent=2)
+    os.rename(staging, target)
+
+    if activate:
+        set_current(registry_dir, version)
+    return version
+
+def verify_checksums(version_dir):
+    with open(os.path.join(version_dir, CHECKSUM_FILE)) as f:
+        checksums = json.load(f)
+    for name, expected in checksums.items():
+        if file_sha256(os.path.join(version_dir, name)) != expected:
+            raise ValueError(f'Checksum mismatch for {name}')
+
+def check_model_info(info_path):
+    import joblib
+    features = joblib.load(info_path).get('features')
+    if list(features or []) != FEATURE_COLUMNS:
+        raise ValueError(f'Model was trained on features {features}, service encodes {FEATURE_COLUMNS}')
+
+class ModelBundle:
+    """Everything one prediction needs from one model version."""
+
+    def __init__(self, version, model, encoders, table=None, item_index=None):
+        self.version = version
+        self.model = model
+        self.encoders = encoders
+        self.table = table
+        self.validator = RequestValidator(encoders)
+        item_index = item_index or {}
+        self.matcher = ItemMatcher(
+            encoders.classes['itemName'], item_index.get('itemCategories'), item_index.get('representatives')
+        )
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+
+    def predict_rows(self, matrix):
+        """Score encoded rows, answering from the prediction table where it covers them."""
+        if self.table is None:
+            return self.model.predict(matrix)
+        if len(matrix) == 1:
+            # The scalar lookup avoids the vectorized path's per-call overhead
+            prediction = self.table.lookup(matrix[0])
+            if prediction is not None:
+                return np.array([prediction])
+        predictions = self.table.lookup_many(matrix)
+        missing = np.isnan(predictions)
+        if missing.any():
+            predictions[missing] = self.model.predict(matrix[missing])
+        return predictions
+
+    def quantity_step_function(self, row):
+        step = self.table.step_function(row[0]) if self.table is not None else None
+        return step if step is not None else self.model.step_function(row, QUANTITY_INDEX)
+
+    def smoke_test(self):
+        """Run a prediction and a sweep; also warms the mapped pages before serving."""
+        row = np.zeros((1, len(FEATURE_COLUMNS)))
+        row[0, MONTH_INDEX] = 1
+        row[0, FEATURE_COLUMNS.index('season_encoded')] = self.encoders.code('season', MONTH_SEASONS[1])
+        row[0, QUANTITY_INDEX] = 50
+        prediction = self.predict_rows(row)
+        _, values = self.quantity_step_function(row)
+        if not (np.isfinite(prediction).all() and np.isfinite(values).all()):
+            raise ValueError(f'Model {self.version} produced a non-finite smoke prediction')
+
+    def describe(self):
+        return {
+            'version': self.version,
+            'loadedAt': self.loaded_at,
+            'fingerprint': self.model.fingerprint()[:12],
+            'predictionTable': self.table is not None
+        }
+
+def load_bundle(version, model_path, encoder_path, serving_dir, table_dirs):
+    """Load and smoke-test one model version; returns (bundle, phase timings)."""
+    timings = {}
+    started = time.perf_counter()
+    model, encoders, item_index = load_serving_artifacts(model_path, encoder_path, serving_dir)
+    if model.n_features != len(FEATURE_COLUMNS):
+        raise ValueError(f'Model expects {model.n_features} features, service encodes {len(FEATURE_COLUMNS)}')
+    timings['model'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    table = None
+    for table_dir in table_dirs:
+        if os.path.isdir(table_dir):
+            candidate = PredictionTable(table_dir)
+            if candidate.model_fingerprint == model.fingerprint():
+                table = candidate
+                print(f"Prediction table loaded: {table.meta['contexts']:,} contexts")
+                break
+            print(f"Prediction table in {table_dir} was built for a different model, ignoring it")
+    timings['table'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    bundle = ModelBundle(version, model, encoders, table, item_index)
+    bundle.smoke_test()
+    timings['warmup'] = time.perf_counter() - started
+    return bundle, timings
+
+class ModelRegistry:
+    """Holds the serving bundle and swaps it on reload, rollback or a CURRENT change.
+
+    Without a registry directory (no CURRENT file) the flat models/ files are
+    served as version 'local' and reload re-reads them. on_swap, if given, is
+    called with the new bundle after every swap.
+    """
+
+    def __init__(self, registry_dir, model_path, encoder_path, serving_dir, table_dir,
+                 poll_seconds=5.0, on_swap=None):
+        self.registry_dir = registry_dir
+        self.model_path = model_path
+        self.encoder_path = encoder_path
+        self.serving_dir = serving_dir
+        self.table_dir = table_dir
+        self.poll_seconds = poll_seconds
+        self.on_swap = on_swap
+
+        self.current = None
+        self.previous = None
+        self._swap_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watch_lock = threading.Lock()
+        self._watch_pid = None
+        self._failed_version = None
+
+    def load(self, version=None):
+        """Load a version (default: the one CURRENT names) without serving it."""
+        version = version or read_current(self.registry_dir)
+        if version in (None, 'local'):
+            return load_bundle('local', self.model_path, self.encoder_path, self.serving_dir,
+                               [self.table_dir])
+
+        version_dir = os.path.join(self.registry_dir, version)
+        if not os.path.isdir(version_dir):
+            raise ValueError(f'Unknown model version: {version}')
+        verify_checksums(version_dir)
+        check_model_info(os.path.join(version_dir, INFO_FILE))
+        return load_bundle(
+            version,
+            os.path.join(version_dir, MODEL_FILE),
+            os.path.join(version_dir, ENCODER_FILE),
+            os.path.join(version_dir, 'serving'),
+            [os.path.join(version_dir, 'prediction_table'), self.table_dir]
+        )
+
+    def load_candidate(self, spec):
+        """Load a registry version or a pickled model path for shadow evaluation.
+
+        The candidate must use the serving encoders, since it scores rows
+        encoded for the served model.
+        """
+        if os.path.isfile(os.path.join(self.registry_dir, spec, CHECKSUM_FILE)):
+            bundle, _ = self.load(spec)
+        else:
+            name = os.path.splitext(os.path.basename(spec))[0]
+            serving_dir = os.path.join(os.path.dirname(self.serving_dir), 'shadow', name)
+            bundle, _ = load_bundle(name, os.path.join(BASE_DIR, spec), self.encoder_path, serving_dir, [])
+        if self.current is not None and bundle.encoders.classes != self.current.encoders.classes:
+            raise ValueError(f'Shadow model {spec} uses different encoders than the served model')
+        return bundle
+
+    def activate(self, bundle):
+        with self._swap_lock:
+            if self.current is not None and self.current.version != bundle.version:
+                self.previous = self.current
+            self.current = bundle
+        if self.on_swap is not None:
+            self.on_swap(bundle)
+        print(f"Serving model version {bundle.version}")
+
+    def reload(self, version=None, publish=False):
+        """Load, validate and swap in a version; publish=True also moves CURRENT."""
+        with self._reload_lock:
+            if version is not None and self.previous is not None and self.previous.version == version:
+                bundle, timings = self.previous, {}
+            else:
+                bundle, timings = self.load(version)
+            if publish and bundle.version != 'local':
+                set_current(self.registry_dir, bundle.version)
+            self.activate(bundle)
+            self._failed_version = None
+            return bundle, timings
+
+    def rollback(self, publish=True):
+        """Swap back to the previous in-memory bundle without touching disk."""
+        # Serialized with reload() so the swap, on_swap and CURRENT always move together
+        with self._reload_lock:
+            with self._swap_lock:
+                if self.previous is None:
+                    raise ValueError('No previous model version to roll back to')
+                self.current, self.previous = self.previous, self.current
+                bundle = self.current
+            if self.on_swap is not None:
+                self.on_swap(bundle)
+            if publish and bundle.version != 'local':
+                set_current(self.registry_dir, bundle.version)
+            print(f"Rolled back to model version {bundle.version}")
+            return bundle
+
+    def ensure_watching(self):
+        # One watcher per process, started lazily so forked gunicorn workers
+        # each get their own (threads do not survive fork)
+        if self._watch_pid == os.getpid() or self.poll_seconds <= 0:
+            return
+        with self._watch_lock:
+            if self._watch_pid == os.getpid():
+                return
+            threading.Thread(target=self._watch, name='model-watcher', daemon=True).start()
+            self._watch_pid = os.getpid()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            version = read_current(self.registry_dir)
+            current = self.current
+            if version is None or current is None or version in (current.version, self._failed_version):
+                continue
+            try:
+                print(f"CURRENT changed to {version}, reloading")
+                self.reload(version)
+            except Exception as e:
+                # Not retried until CURRENT names another version
+                self._failed_version = version
+                print(f"Failed to load model version {version}: {e}")
+
+    def stats(self):
+        return {
+            'current': self.current.describe() if self.current is not None else None,
+            'previous': self.previous.describe() if self.previous is not None else None,
+            'registryVersion': read_current(self.registry_dir),
+            'availableVersions': list_versions(self.registry_dir)
+        }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage versioned models for the ML service')
+    parser.add_argument('--registry', default=REGISTRY_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    publish = commands.add_parser('publish', help='copy the trained model into a new version')
+    publish.add_argument('--version')
+    publish.add_argument('--model', default=os.path.join(MODEL_DIR, MODEL_FILE))
+    publish.add_argument('--encoders', default=os.path.join(MODEL_DIR, ENCODER_FILE))
+    publish.add_argument('--info', default=os.path.join(MODEL_DIR, INFO_FILE))
+    publish.add_argument('--no-activate', action='store_true')
+
+    activate = commands.add_parser('activate', help='point CURRENT at an existing version')
+    activate.add_argument('version')
+
+    commands.add_parser('list', help='show versions and the active one')
+    args = parser.parse_args()
+
+    if args.command == 'publish':
+        version = publish_version(args.registry, args.model, args.encoders, args.info,
+                                  args.version, activate=not args.no_activate)
+        print(f"Published {version}" + ('' if args.no_activate else ' (now current)'))
+    elif args.command == 'activate':
+        set_current(args.registry, args.version)
+        print(f"CURRENT -> {args.version}")
+    else:
+        active = read_current(args.registry)
+        for version in list_versions(args.registry):
+            print(('* ' if version == active else '  ') + version)
@@ -0,0 +1,256 @@
+"""
+Precomputed Prediction Table
+For a fixed context (item, category, day, meal period, weather, special event,
+month) the tree ensemble is a step function of preparedQuantity. This module
+enumerates every context offline, stores each step function as breakpoints and
+values in memory-mappable arrays, and answers predictions with an index
+computation plus a binary search.
+
+Usage: python prediction_table.py [--all-categories] [--verify 5000]
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from itertools import product
+
+import numpy as np
+
+from feature_encoding import CATEGORICAL_FEATURES, FEATURE_COLUMNS, MONTH_SEASONS, QUANTITY_INDEX
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, 'models', 'waste_prediction_model_gb.pkl')
+ENCODER_PATH = os.path.join(BASE_DIR, 'models', 'feature_encoders.pkl')
+TABLE_DIR = os.path.join(BASE_DIR, 'models', 'prediction_table')
+
+ITEM, CATEGORY, DAY, MEAL, WEATHER, SEASON = range(len(CATEGORICAL_FEATURES))
+SPECIAL = FEATURE_COLUMNS.index('specialEvent_encoded')
+MONTH = FEATURE_COLUMNS.index('month')
+
+class PredictionTable:
+    """Read-only view of a built prediction table.
+
+    Contexts are numbered in mixed radix over (item/category pair, day,
+    meal period, weather, special event, month). Breakpoints are stored as
+    indices into one shared grid of quantity thresholds.
+    """
+
+    def __init__(self, directory, mmap_mode='r'):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+        def load(name):
+            return np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode)
+
+        self.pairs = np.asarray(load('pairs'))
+        self.grid = np.asarray(load('grid'))
+        self.offsets = load('offsets')
+        self.breakpoints = load('breakpoints')
+        self.values = load('values')
+
+        self.model_fingerprint = self.meta['modelFingerprint']
+        self.radix = self.meta['radix']
+        self.season_for_month = np.array([-1] + self.meta['seasonForMonth'])
+        self._max_segment = int(self.meta['maxBreakpoints'])
+
+    def context_index(self, row):
+        """Context number for one encoded row, or None if the table does not cover it."""
+        codes = [int(row[i]) for i in (ITEM, CATEGORY, DAY, MEAL, WEATHER, SPECIAL, MONTH)]
+        item, category, day, meal, weather, special, month = codes
+        if (min(codes) < 0 or item >= self.pairs.shape[0] or category >= self.pairs.shape[1]
+                or not 1 <= month <= 12 or int(row[SEASON]) != self.season_for_month[month]):
+            return None
+        pair = int(self.pairs[item, category])
+        index = pair
+        for code, size in zip((day, meal, weather, special, month - 1), self.radix):
+            if code >= size:
+                return None
+            index = index * size + code
+        return index if pair >= 0 else None
+
+    def step_function(self, row):
+        """(breakpoints, values) for the row's context, matching FlatTreeEnsemble.step_function."""
+        context = self.context_index(row)
+        if context is None:
+            return None
+        start, end = int(self.offsets[context]), int(self.offsets[context + 1])
+        breakpoints = self.grid[self.breakpoints[start:end]]
+        values = np.asarray(self.values[start + context:end + context + 1], dtype=np.float64)
+        return breakpoints, values
+
+    def lookup(self, row):
+        step = self.step_function(row)
+        if step is None:
+            return None
+        breakpoints, values = step
+        return float(values[np.searchsorted(breakpoints, np.float32(row[QUANTITY_INDEX]))])
+
+    def lookup_many(self, X):
+        """Vectorized lookup; rows the table does not cover come back as NaN."""
+        X = np.asarray(X)
+        codes = X[:, [ITEM, CATEGORY, DAY, MEAL, WEATHER, SPECIAL, MONTH]].astype(np.int64)
+        month = codes[:, 6]
+        valid = ((codes >= 0).all(axis=1)
+                 & (codes[:, 0] < self.pairs.shape[0]) & (codes[:, 1] < self.pairs.shape[1])
+                 & (month >= 1) & (month <= 12))
+        for column, size in zip(range(2, 6), self.radix):
+            valid &= codes[:, column] < size
+
+        result = np.full(len(X), np.nan)
+        rows = np.flatnonzero(valid)
+        if not len(rows):
+            return result
+
+        codes = codes[rows]
+        valid = X[rows, SEASON].astype(np.int64) == self.season_for_month[codes[:, 6]]
+        pair = self.pairs[codes[:, 0], codes[:, 1]]
+        valid &= pair >= 0
+
+        context = pair.astype(np.int64)
+        digits = np.column_stack([codes[:, 2:6], codes[:, 6] - 1])
+        for column, size in enumerate(self.radix):
+            context = context * size + digits[:, column]
+        rows, context = rows[valid], context[valid]
+
+        # Binary search within each context's own breakpoint segment
+        quantity = X[rows, QUANTITY_INDEX].astype(np.float32)
+        start = np.asarray(self.offsets[context])
+        lo, hi = start.copy(), np.asarray(self.offsets[context + 1])
+        for _ in range(int(np.ceil(np.log2(self._max_segment + 1)))):
+            active = lo < hi
+            mid = (lo + hi) // 2
+            probe = np.minimum(mid, len(self.breakpoints) - 1)
+            below = self.grid[self.breakpoints[probe]] < quantity
+            lo = np.where(active & below, mid + 1, lo)
+            hi = np.where(active & ~below, mid, hi)
+
+        result[rows] = self.values[lo + context]
+        return result
+
+def build_prediction_table(model, compiled_encoders, item_categories, output_dir, all_categories=False):
+    """Enumerate every context and write the table to output_dir."""
+    tables = compiled_encoders.tables
+    items = tables['itemName']
+    categories = tables['category']
+
+    if all_categories:
+        pairs = [(i, c) for i in range(len(items)) for c in range(len(categories))]
+    else:
+        pairs = [
+            (items[item], categories[category])
+            for item, category in sorted(item_categories.items())
+            if item in items and category in categories
+        ]
+    pair_index = np.full((len(items), len(categories)), -1, dtype=np.int32)
+    for pair_id, (item, category) in enumerate(pairs):
+        pair_index[item, category] = pair_id
+
+    radix = [len(tables['dayOfWeek']), len(tables['mealPeriod']), len(tables['weather']), 2, 12]
+    season_for_month = [tables['season'][MONTH_SEASONS[m]] for m in range(1, 13)]
+    contexts_per_pair = int(np.prod(radix))
+    n_contexts = len(pairs) * contexts_per_pair
+
+    grid = model.split_values(QUANTITY_INDEX)
+    index_dtype = np.uint8 if len(grid) <= 256 else np.uint16
+
+    print(f"Building prediction table: {len(pairs)} item/category pairs, {n_contexts:,} contexts")
+    print(f"Quantity grid: {len(grid)} thresholds")
+
+    offsets = np.zeros(n_contexts + 1, dtype=np.int64)
+    breakpoint_chunks, value_chunks = [], []
+    row = np.zeros(len(FEATURE_COLUMNS))
+    context = 0
+    start_time = time.time()
+
+    for pair_id, (item, category) in enumerate(pairs):
+        row[ITEM], row[CATEGORY] = item, category
+        for day, meal, weather, special, month in product(*[range(size) for size in radix]):
+            row[DAY], row[MEAL], row[WEATHER], row[SPECIAL] = day, meal, weather, special
+            row[MONTH] = month + 1
+            row[SEASON] = season_for_month[month]
+
+            breakpoints, values = model.step_function(row, QUANTITY_INDEX)
+            breakpoint_chunks.append(np.searchsorted(grid, breakpoints).astype(index_dtype))
+            value_chunks.append(values.astype(np.float32))
+            offsets[context + 1] = offsets[context] + len(breakpoints)
+            context += 1
+
+        if (pair_id + 1) % 10 == 0 or pair_id + 1 == len(pairs):
+            elapsed = time.time() - start_time
+            print(f"  {pair_id + 1}/{len(pairs)} pairs | {context / elapsed:,.0f} contexts/sec")
+
+    breakpoints = np.concatenate(breakpoint_chunks)
+    values = np.concatenate(value_chunks)
+
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, 'pairs.npy'), pair_index)
+    np.save(os.path.join(output_dir, 'grid.npy'), grid)
+    np.save(os.path.join(output_dir, 'offsets.npy'), offsets)
+    np.save(os.path.join(output_dir, 'breakpoints.npy'), breakpoints)
+    np.save(os.path.join(output_dir, 'values.npy'), values)
+    with open(os.path.join(output_dir, 'meta.json'), 'w') as f:
+        json.dump({
+            'modelFingerprint': model.fingerprint(),
+            'radix': radix,
+            'seasonForMonth': season_for_month,
+            'contexts': n_contexts,
+            'maxBreakpoints': int(np.diff(offsets).max()),
+            'builtAt': datetime.now().isoformat(timespec='seconds')
+        }, f, indent=2)
+
+    size_mb = (offsets.nbytes + breakpoints.nbytes + values.nbytes) / 1024 ** 2
+    print(f"Table saved to {output_dir} ({size_mb:.1f} MB, {time.time() - start_time:.0f}s)")
+
+def verify_prediction_table(table, model, n_rows=5000, seed=42):
+    """Compare table lookups with the engine on random covered contexts."""
+    rng = np.random.default_rng(seed)
+    pairs = np.argwhere(table.pairs >= 0)
+    chosen = pairs[rng.integers(0, len(pairs), n_rows)]
+    month = rng.integers(1, 13, n_rows)
+
+    X = np.zeros((n_rows, len(FEATURE_COLUMNS)))
+    X[:, ITEM], X[:, CATEGORY] = chosen[:, 0], chosen[:, 1]
+    for column, size in zip((DAY, MEAL, WEATHER, SPECIAL), table.radix):
+        X[:, column] = rng.integers(0, size, n_rows)
+    X[:, MONTH] = month
+    X[:, SEASON] = table.season_for_month[month]
+    X[:, QUANTITY_INDEX] = rng.integers(1, 200, n_rows)
+
+    expected = model.predict(X)
+    looked_up = table.lookup_many(X)
+    single = np.array([table.lookup(row) for row in X[:200]])
+
+    start = time.perf_counter()
+    for row in X[:1000]:
+        table.lookup(row)
+    per_lookup = (time.perf_counter() - start) / 1000
+
+    print(f"Max abs difference (vectorized): {np.abs(looked_up - expected).max():.2e}")
+    print(f"Max abs difference (single):     {np.abs(single - expected[:200]).max():.2e}")
+    print(f"Single lookup: {per_lookup * 1e6:.1f}us")
+
+if __name__ == '__main__':
+    import joblib
+    from feature_encoding import CompiledEncoders
+    from generate_expanded_dataset import MENU_ITEMS
+    from tree_engine import FlatTreeEnsemble
+
+    parser = argparse.ArgumentParser(description='Build the precomputed prediction table')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--encoders', default=ENCODER_PATH)
+    parser.add_argument('--output', default=TABLE_DIR)
+    parser.add_argument('--all-categories', action='store_true',
+                        help='enumerate every item with every category, not just its own')
+    parser.add_argument('--verify', type=int, default=5000,
+                        help='random rows to check against the model (0 to skip)')
+    args = parser.parse_args()
+
+    model = FlatTreeEnsemble.from_sklearn(joblib.load(args.model))
+    compiled = CompiledEncoders.from_encoders(joblib.load(args.encoders))
+    item_categories = {item: category for category, names in MENU_ITEMS.items() for item in names}
+
+    build_prediction_table(model, compiled, item_categories, args.output, args.all_categories)
+    if args.verify:
+        verify_prediction_table(PredictionTable(args.output), model, args.verify)
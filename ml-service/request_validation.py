@@ -0,0 +1,119 @@
+"""
+Request Validation and JSON Handling
+Checks prediction payloads against rules compiled once from the encoder
+classes and reports problems as a list of {field, message} instead of raising.
+Also provides an orjson-backed JSON provider for Flask when orjson is installed.
+"""
+
+import math
+from datetime import datetime
+from functools import lru_cache
+
+from flask.json.provider import DefaultJSONProvider
+
+from feature_encoding import MONTH_SEASONS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Categorical fields checked against the encoder classes; unknown values are
+# warnings (they are encoded as unknown), not errors
+ENUM_FIELDS = ('category', 'dayOfWeek', 'mealPeriod', 'weather')
+DEFAULTS = {'mealPeriod': 'all-day', 'weather': 'cloudy'}
+
+@lru_cache(maxsize=4096)
+def month_and_season(date_string):
+    """(month, season) for a YYYY-MM-DD date, or None if it does not parse."""
+    try:
+        month = datetime.strptime(date_string, '%Y-%m-%d').month
+    except ValueError:
+        return None
+    return month, MONTH_SEASONS[month]
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+class RequestValidator:
+    """Type and enum checks for one prediction payload."""
+
+    def __init__(self, encoders):
+        self.allowed = {field: frozenset(encoders.classes[field]) for field in ENUM_FIELDS}
+
+    def validate(self, data):
+        """Return (features, errors, warnings).
+
+        features holds the raw field values plus month and season; it is None
+        when errors is non-empty.
+        """
+        if not isinstance(data, dict):
+            return None, [{'field': None, 'message': 'Input must be a JSON object'}], []
+
+        errors = []
+        warnings = []
+        get = data.get
+
+        item_name = get('itemName')
+        if item_name is not None and not isinstance(item_name, str):
+            errors.append({'field': 'itemName', 'message': 'itemName must be a string'})
+
+        restaurant_id = get('restaurantId')
+        if restaurant_id is not None and not isinstance(restaurant_id, str):
+            errors.append({'field': 'restaurantId', 'message': 'restaurantId must be a string'})
+
+        features = {'itemName': item_name, 'restaurantId': restaurant_id}
+        for field in ENUM_FIELDS:
+            value = get(field, DEFAULTS.get(field))
+            if value is not None and not isinstance(value, str):
+                errors.append({'field': field, 'message': f'{field} must be a string'})
+            elif value not in self.allowed[field]:
+                warnings.append({'field': field, 'message': f'Unknown {field} {value!r}'})
+            features[field] = value
+
+        special_event = get('specialEvent', False)
+        if not isinstance(special_event, bool) and special_event not in (0, 1):
+            errors.append({'field': 'specialEvent', 'message': 'specialEvent must be a boolean'})
+        features['specialEvent'] = special_event
+
+        prepared_qty = get('preparedQuantity')
+        if not is_number(prepared_qty) or not math.isfinite(prepared_qty):
+            errors.append({'field': 'preparedQuantity', 'message': 'preparedQuantity must be a number'})
+        features['preparedQuantity'] = prepared_qty
+
+        date_string = get('date')
+        if date_string is None:
+            month = datetime.now().month
+            season = MONTH_SEASONS[month]
+        else:
+            parsed = month_and_season(date_string) if isinstance(date_string, str) else None
+            if parsed is None:
+                errors.append({'field': 'date', 'message': 'date must be a YYYY-MM-DD string'})
+                month, season = None, None
+            else:
+                month, season = parsed
+        features['month'] = month
+        features['season'] = season
+
+        if errors:
+            return None, errors, warnings
+        return features, errors, warnings
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider using orjson for request parsing and responses."""
+
+    def _options(self, sort_keys):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        return option | orjson.OPT_SORT_KEYS if sort_keys else option
+
+    def dumps(self, obj, **kwargs):
+        option = self._options(kwargs.get('sort_keys', self.sort_keys))
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options(self.sort_keys))
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,185 @@
+"""
+Incremental Retraining
+Updates the deployed model with newly arrived rows only: the rows are encoded
+with the deployed encoders (classes never seen before are appended, so
+existing codes keep their meaning), and the ensemble is extended with
+warm-start trees fitted on the new rows. The last days of the new rows are
+held out to compare the deployed model, the updated one and, unless skipped,
+a full retrain on the history plus the new rows. The updated model is
+published as a new registry version and activated if it does not do worse
+than the deployed model on the holdout.
+
+Usage: python retrain_incremental.py new_rows.csv [--trees 20] [--no-full-retrain] [--no-activate]
+"""
+
+import argparse
+import json
+import os
+import pickle
+import time
+import warnings
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+
+from feature_encoding import SOURCE_COLUMNS
+from feature_pipeline import CSV_PATH, encode_features, extend_encoders, read_source
+from model_registry import (ENCODER_FILE, INFO_FILE, MODEL_FILE, REGISTRY_DIR, publish_version, read_current,
+                            set_current)
+from tree_engine import FlatTreeEnsemble
+
+warnings.filterwarnings('ignore')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, 'models')
+OUTPUT_DIR = os.path.join(MODEL_DIR, 'incremental')
+
+def deployed_model(registry_dir):
+    """(version, model path, encoder path, info path) of the model the service runs."""
+    version = read_current(registry_dir)
+    if version:
+        directory = os.path.join(registry_dir, version)
+        return version, os.path.join(directory, MODEL_FILE), os.path.join(directory, ENCODER_FILE), \
+            os.path.join(directory, INFO_FILE)
+    return 'local', os.path.join(MODEL_DIR, MODEL_FILE), os.path.join(MODEL_DIR, ENCODER_FILE), \
+        os.path.join(MODEL_DIR, INFO_FILE)
+
+def split_holdout(df, fraction):
+    """Hold out the latest dates covering about fraction of the rows (a random split if there is one date)."""
+    dates = pd.to_datetime(df['date'])
+    if dates.nunique() < 2:
+        return train_test_split(df, test_size=fraction, random_state=42)
+    cutoff = dates.quantile(1 - fraction)
+    if (dates > cutoff).sum() == 0:
+        cutoff = dates.max() - pd.Timedelta(days=1)
+    return df[dates <= cutoff], df[dates > cutoff]
+
+def warm_start(model, X, y, n_trees):
+    """Copy of model extended with n_trees trees (boosting iterations) fitted on X, y."""
+    if hasattr(model, '_predictors'):
+        # HistGradientBoosting refits its bins on every fit and then scores the
+        # existing trees on the re-binned rows, which is wrong for new data
+        raise ValueError('HistGradientBoosting models cannot be warm-started on new rows; '
+                         'retrain them with train_hist_gb.py')
+    model = pickle.loads(pickle.dumps(model))
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_trees)
+    model.fit(X, y)
+    model.set_params(warm_start=False)
+    return model
+
+def evaluate(model, X, y):
+    flat = FlatTreeEnsemble.from_sklearn(model)
+    predictions = flat.predict(X)
+    return {
+        'holdoutR2': round(r2_score(y, predictions), 4) if len(y) > 1 else None,
+        'holdoutMAE': round(mean_absolute_error(y, predictions), 3),
+        'holdoutRMSE': round(float(np.sqrt(mean_squared_error(y, predictions))), 3),
+        'trees': flat.n_trees
+    }
+
+def print_report(report):
+    names = [name for name in ('deployed', 'incremental', 'fullRetrain') if name in report['models']]
+    rows = [
+        ('training rows', lambda r: f"{r['trainRows']:,}" if r.get('trainRows') is not None else '-'),
+        ('fit time', lambda r: f"{r['fitSeconds']:.2f}s" if r.get('fitSeconds') is not None else '-'),
+        ('trees', lambda r: f"{r['trees']}"),
+        ('holdout R²', lambda r: f"{r['holdoutR2']:.4f}" if r['holdoutR2'] is not None else '-'),
+        ('holdout MAE', lambda r: f"{r['holdoutMAE']:.3f}pp"),
+        ('holdout RMSE', lambda r: f"{r['holdoutRMSE']:.3f}pp"),
+    ]
+    first, last = report['holdoutDates']
+    print(f"\nHoldout: {report['holdoutRows']:,} rows from {first} to {last}")
+    print(f"{'':<16}" + ''.join(f"{name:>16}" for name in names))
+    for label, fmt in rows:
+        print(f"{label:<16}" + ''.join(f"{fmt(report['models'][name]):>16}" for name in names))
+
+def retrain(args):
+    version, model_path, encoder_path, info_path = deployed_model(args.registry)
+    print(f"Deployed model: {version} ({model_path})")
+    deployed = joblib.load(model_path)
+    if hasattr(deployed, '_predictors'):
+        raise SystemExit('The deployed model is HistGradientBoosting, which cannot be warm-started on new rows; '
+                         'retrain it with train_hist_gb.py')
+    encoders = joblib.load(encoder_path)
+    info = joblib.load(info_path)
+
+    new_rows = pd.read_csv(args.new_data, usecols=SOURCE_COLUMNS)
+    train_rows, holdout_rows = split_holdout(new_rows, args.holdout_fraction)
+    print(f"New data: {len(new_rows):,} rows | updating on {len(train_rows):,}, holding out {len(holdout_rows):,}")
+
+    extended, added = extend_encoders(encoders, new_rows)
+    for col, classes in added.items():
+        print(f"  New {col} classes appended: {', '.join(map(str, classes))}")
+    X_train, y_train, _ = encode_features(train_rows, extended)
+    X_holdout, y_holdout, _ = encode_features(holdout_rows, extended)
+
+    holdout_dates = pd.to_datetime(holdout_rows['date'])
+    report = {
+        'parentVersion': version,
+        'newData': os.path.abspath(args.new_data),
+        'newRows': len(new_rows),
+        'holdoutRows': len(holdout_rows),
+        'holdoutDates': [holdout_dates.min().strftime('%Y-%m-%d'), holdout_dates.max().strftime('%Y-%m-%d')],
+        'addedClasses': {col: [str(c) for c in classes] for col, classes in added.items()},
+        'models': {'deployed': evaluate(deployed, X_holdout, y_holdout)}
+    }
+
+    start = time.perf_counter()
+    updated = warm_start(deployed, X_train, y_train, args.trees)
+    report['models']['incremental'] = dict(evaluate(updated, X_holdout, y_holdout),
+                                           trainRows=len(X_train), fitSeconds=round(time.perf_counter() - start, 2))
+
+    if not args.no_full_retrain:
+        # A from-scratch retrain fits its own encoders on the history plus the new training rows
+        history = read_source(args.history)
+        start = time.perf_counter()
+        X_full, y_full, full_encoders = encode_features(pd.concat([history, train_rows], ignore_index=True))
+        full = clone(deployed).fit(X_full, y_full)
+        fit_seconds = time.perf_counter() - start
+        X_full_holdout, _, _ = encode_features(holdout_rows, extend_encoders(full_encoders, holdout_rows)[0])
+        report['models']['fullRetrain'] = dict(evaluate(full, X_full_holdout, y_holdout),
+                                               trainRows=len(X_full), fitSeconds=round(fit_seconds, 2))
+
+    print_report(report)
+
+    new_version = args.version or datetime.now().strftime('v%Y%m%d-%H%M%S')
+    staging = os.path.join(OUTPUT_DIR, new_version)
+    os.makedirs(staging, exist_ok=True)
+    joblib.dump(updated, os.path.join(staging, MODEL_FILE))
+    joblib.dump(extended, os.path.join(staging, ENCODER_FILE))
+    joblib.dump(dict(info, algorithm=f"{info.get('algorithm', type(deployed).__name__)} (incremental)",
+                     parentVersion=version, incrementalRows=len(X_train)), os.path.join(staging, INFO_FILE))
+    publish_version(args.registry, os.path.join(staging, MODEL_FILE), os.path.join(staging, ENCODER_FILE),
+                    os.path.join(staging, INFO_FILE), new_version, activate=False)
+
+    not_worse = report['models']['incremental']['holdoutMAE'] <= report['models']['deployed']['holdoutMAE']
+    report['version'] = new_version
+    report['activated'] = bool(not_worse and not args.no_activate)
+    if report['activated']:
+        set_current(args.registry, new_version)
+        print(f"\nPublished {new_version} (now current)")
+    else:
+        reason = '--no-activate' if args.no_activate else 'holdout MAE is worse than the deployed model'
+        print(f"\nPublished {new_version}, not activated ({reason}); "
+              f"run `python model_registry.py activate {new_version}` to switch")
+    with open(os.path.join(staging, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Update the deployed model with newly arrived rows')
+    parser.add_argument('new_data', help='CSV of new rows with the dataset columns')
+    parser.add_argument('--trees', type=int, default=20, help='trees (boosting iterations) added for the new rows')
+    parser.add_argument('--holdout-fraction', type=float, default=0.2,
+                        help='share of the new rows, latest dates first, held out for the report')
+    parser.add_argument('--history', default=CSV_PATH, help='dataset the full retrain comparison starts from')
+    parser.add_argument('--no-full-retrain', action='store_true', help='skip the full retrain comparison')
+    parser.add_argument('--registry', default=REGISTRY_DIR)
+    parser.add_argument('--version')
+    parser.add_argument('--no-activate', action='store_true', help='publish without making the version current')
+    retrain(parser.parse_args())
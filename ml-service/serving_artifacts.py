@@ -0,0 +1,110 @@
+"""
+Memory-Mappable Serving Artifacts
+Exports the pickled model and encoders once into plain .npy arrays and JSON, so
+the service can start by mapping files instead of importing scikit-learn and
+unpickling. The item index used for fuzzy item matching (item categories and
+ranked category representatives) is computed at the same time. The export is
+redone whenever the source pickles change.
+
+Usage: python serving_artifacts.py [--force]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+from feature_encoding import CompiledEncoders
+from item_matcher import rank_representatives
+from tree_engine import FlatTreeEnsemble
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, 'models', 'waste_prediction_model_gb.pkl')
+ENCODER_PATH = os.path.join(BASE_DIR, 'models', 'feature_encoders.pkl')
+SERVING_DIR = os.path.join(BASE_DIR, 'models', 'serving')
+
+ENCODERS_FILE = 'encoders.json'
+ITEM_INDEX_FILE = 'item_index.json'
+
+def source_stamp(model_path, encoder_path):
+    """Size and mtime of the source pickles, recorded to detect stale exports."""
+    stamp = {}
+    for name, path in (('model', model_path), ('encoders', encoder_path)):
+        stat = os.stat(path)
+        stamp[name] = [stat.st_size, stat.st_mtime_ns]
+    return stamp
+
+def is_current(serving_dir, model_path, encoder_path):
+    try:
+        with open(os.path.join(serving_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        return (meta.get('source') == source_stamp(model_path, encoder_path)
+                and os.path.isfile(os.path.join(serving_dir, ITEM_INDEX_FILE)))
+    except (OSError, ValueError):
+        return False
+
+def build_item_index(model, encoders):
+    # The generator's menu is the item -> category mapping the model was trained on
+    from generate_expanded_dataset import MENU_ITEMS
+    item_categories = {
+        item: category for category, items in MENU_ITEMS.items() for item in items
+        if item in encoders.known_items
+    }
+    return {
+        'itemCategories': item_categories,
+        'representatives': rank_representatives(model, encoders, item_categories)
+    }
+
+def export_serving_artifacts(model_path, encoder_path, serving_dir):
+    """Unpickle the sources and write the serving artifacts; returns (model, encoders, item index)."""
+    import joblib
+    model = FlatTreeEnsemble.from_sklearn(joblib.load(model_path))
+    encoders = CompiledEncoders.from_encoders(joblib.load(encoder_path))
+    item_index = build_item_index(model, encoders)
+    stamp = source_stamp(model_path, encoder_path)
+
+    # Written next to the target and renamed, so a concurrently starting
+    # process never maps a half-written directory
+    staging = f"{serving_dir}.tmp{os.getpid()}"
+    try:
+        os.makedirs(staging, exist_ok=True)
+        encoders.save(os.path.join(staging, ENCODERS_FILE))
+        with open(os.path.join(staging, ITEM_INDEX_FILE), 'w') as f:
+            json.dump(item_index, f, indent=2)
+        model.save(staging, source=stamp)
+        if os.path.isdir(serving_dir):
+            shutil.rmtree(serving_dir)
+        os.rename(staging, serving_dir)
+        print(f"Serving artifacts written to {serving_dir}")
+    except OSError as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        print(f"Could not write serving artifacts ({e}), continuing with the unpickled model")
+    return model, encoders, item_index
+
+def load_serving_artifacts(model_path, encoder_path, serving_dir):
+    """Map the exported artifacts, exporting them first if missing or stale."""
+    if not is_current(serving_dir, model_path, encoder_path):
+        return export_serving_artifacts(model_path, encoder_path, serving_dir)
+    model = FlatTreeEnsemble.load(serving_dir)
+    encoders = CompiledEncoders.load(os.path.join(serving_dir, ENCODERS_FILE))
+    with open(os.path.join(serving_dir, ITEM_INDEX_FILE)) as f:
+        item_index = json.load(f)
+    return model, encoders, item_index
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the model and encoders for fast loading')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--encoders', default=ENCODER_PATH)
+    parser.add_argument('--output', default=SERVING_DIR)
+    parser.add_argument('--force', action='store_true', help='export even if up to date')
+    args = parser.parse_args()
+
+    if args.force or not is_current(args.output, args.model, args.encoders):
+        export_serving_artifacts(args.model, args.encoders, args.output)
+    else:
+        print(f"Serving artifacts in {args.output} are up to date")
+
+    start = time.perf_counter()
+    load_serving_artifacts(args.model, args.encoders, args.output)
+    print(f"Load time: {(time.perf_counter() - start) * 1000:.1f}ms")
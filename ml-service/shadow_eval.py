@@ -0,0 +1,165 @@
+"""
+Shadow Model Evaluation
+Encoded rows answered by the serving model are offered to a bounded queue; a
+background thread scores them in batches with candidate models and aggregates
+latency and disagreement against the served predictions. A full queue drops
+the work instead of making the request wait; sample_rate bounds how much CPU
+the candidates take from serving.
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+
+import numpy as np
+
+# Absolute differences (percentage points) counted as disagreements
+DISAGREEMENT_THRESHOLDS = (1.0, 5.0)
+
+class _CandidateStats:
+    def __init__(self):
+        self.batches = 0
+        self.rows = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.diff_total = 0.0
+        self.abs_diff_total = 0.0
+        self.sq_diff_total = 0.0
+        self.abs_diff_max = 0.0
+        self.disagreements = [0] * len(DISAGREEMENT_THRESHOLDS)
+
+    def record(self, latency, diff):
+        abs_diff = np.abs(diff)
+        self.batches += 1
+        self.rows += len(diff)
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.diff_total += float(diff.sum())
+        self.abs_diff_total += float(abs_diff.sum())
+        self.sq_diff_total += float((diff ** 2).sum())
+        self.abs_diff_max = max(self.abs_diff_max, float(abs_diff.max()))
+        for i, threshold in enumerate(DISAGREEMENT_THRESHOLDS):
+            self.disagreements[i] += int((abs_diff > threshold).sum())
+
+    def summary(self):
+        rows = self.rows or 1
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'meanBatchLatencyMs': round(self.latency_total / (self.batches or 1) * 1000, 3),
+            'maxBatchLatencyMs': round(self.latency_max * 1000, 3),
+            'meanRowLatencyUs': round(self.latency_total / rows * 1e6, 2),
+            # Differences are candidate minus served prediction, in percentage points
+            'meanDiff': round(self.diff_total / rows, 4),
+            'meanAbsDiff': round(self.abs_diff_total / rows, 4),
+            'rmsDiff': round((self.sq_diff_total / rows) ** 0.5, 4),
+            'maxAbsDiff': round(self.abs_diff_max, 4),
+            'disagreementRate': {
+                f'over{threshold:g}pp': round(count / rows, 4)
+                for threshold, count in zip(DISAGREEMENT_THRESHOLDS, self.disagreements)
+            }
+        }
+
+class ShadowEvaluator:
+    """Scores served rows with candidate models on a background thread.
+
+    load_candidates is called on that thread and returns {name: bundle};
+    each bundle needs a predict_rows(matrix) method.
+    """
+
+    def __init__(self, load_candidates, max_queue=10000, max_batch_size=256, sample_rate=1.0):
+        self.load_candidates = load_candidates
+        self.sample_rate = sample_rate
+        self.max_queue = max_queue
+        self.max_batch_size = max_batch_size
+        self.candidates = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.offered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.load_error = None
+        self.stats_by_model = {}
+
+    def _ensure_worker(self):
+        # Started lazily so the thread and queue belong to the serving process
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.max_queue)
+            threading.Thread(target=self._run, name='shadow-eval', daemon=True).start()
+            self._pid = os.getpid()
+
+    def offer(self, rows, predictions):
+        """Queue encoded rows with the served predictions; never blocks."""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((rows, predictions))
+            dropped = 0
+        except queue.Full:
+            dropped = len(rows)
+        with self._stats_lock:
+            self.offered += len(rows)
+            self.dropped += dropped
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        while rows < self.max_batch_size:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(entry)
+            rows += len(entry[0])
+        return batch
+
+    def _run(self):
+        try:
+            self.candidates = self.load_candidates()
+            print(f"Shadow evaluation running for: {', '.join(self.candidates) or 'no candidates'}")
+        except Exception as e:
+            self.load_error = str(e)
+            self.candidates = {}
+            print(f"Shadow candidates failed to load: {e}")
+
+        while True:
+            batch = self._next_batch()
+            if not self.candidates:
+                continue
+            X = np.vstack([rows for rows, _ in batch])
+            served = np.concatenate([np.asarray(predictions, dtype=np.float64) for _, predictions in batch])
+            for name, candidate in self.candidates.items():
+                started = time.perf_counter()
+                try:
+                    predictions = candidate.predict_rows(X)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Shadow model {name} failed: {e}")
+                    continue
+                latency = time.perf_counter() - started
+                with self._stats_lock:
+                    self.stats_by_model.setdefault(name, _CandidateStats()).record(latency, predictions - served)
+
+    def stats(self):
+        with self._stats_lock:
+            models = {name: stats.summary() for name, stats in self.stats_by_model.items()}
+        return {
+            'candidates': list(self.candidates) if self.candidates is not None else None,
+            'loadError': self.load_error,
+            'sampleRate': self.sample_rate,
+            'maxQueue': self.max_queue,
+            'queued': self._queue.qsize() if self._pid == os.getpid() else 0,
+            'offeredRows': self.offered,
+            'droppedRows': self.dropped,
+            'errors': self.errors,
+            'models': models
+        }
@@ -1,14 +1,17 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import matplotlib.pyplot as plt
 import seaborn as sns
 import joblib
 import os
 import warnings
+
+from feature_encoding import FEATURE_COLUMNS
+from feature_pipeline import load_split
+from memory_usage import PeakRSS
+
 warnings.filterwarnings('ignore')
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -24,41 +27,9 @@ ENCODER_PATH = os.path.join(MODEL_DIR, 'feature_encoders.pkl')
 INFO_PATH = os.path.join(MODEL_DIR, 'model_info.pkl')
 CHART_PATH = os.path.join(MODEL_DIR, 'model_performance.png')
 
-print(f"Loading dataset from: {CSV_PATH}")
-df = pd.read_csv(CSV_PATH)
-print(f"Loaded {len(df):,} records with {df['itemName'].nunique()} unique items\n")
-
-encoders = {}
-categorical_columns = ['itemName', 'category', 'dayOfWeek', 'mealPeriod', 'weather']
-
-for col in categorical_columns:
-    encoders[col] = LabelEncoder()
-    df[col + '_encoded'] = encoders[col].fit_transform(df[col])
-
-df['specialEvent_encoded'] = df['specialEvent'].map({True: 1, False: 0})
-
-df['date'] = pd.to_datetime(df['date'])
-df['month'] = df['date'].dt.month
-df['season'] = df['date'].dt.month.map({
-    12: 'Winter', 1: 'Winter', 2: 'Winter',
-    3: 'Spring', 4: 'Spring', 5: 'Spring',
-    6: 'Summer', 7: 'Summer', 8: 'Summer',
-    9: 'Autumn', 10: 'Autumn', 11: 'Autumn'
-})
-encoders['season'] = LabelEncoder()
-df['season_encoded'] = encoders['season'].fit_transform(df['season'])
-
-feature_columns = [
-    'itemName_encoded', 'category_encoded', 'dayOfWeek_encoded',
-    'mealPeriod_encoded', 'weather_encoded', 'season_encoded',
-    'specialEvent_encoded', 'month', 'preparedQuantity'
-]
-
-X = df[feature_columns]
-y = df['wastePercentage']
-
 # Split data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+X_train, X_test, y_train, y_test, encoders = load_split(CSV_PATH, test_size=0.2, random_state=42)
+feature_columns = FEATURE_COLUMNS
 print(f"Training: {len(X_train):,} | Test: {len(X_test):,}")
 
 # Train model
@@ -71,7 +42,9 @@ model = RandomForestRegressor(
     random_state=42,
     n_jobs=-1
 )
-model.fit(X_train, y_train)
+with PeakRSS() as fit_memory:
+    model.fit(X_train, y_train)
+print(f"Peak RSS during fit: {fit_memory}")
 
 # Predictions
 y_train_pred = model.predict(X_train)
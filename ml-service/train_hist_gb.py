@@ -0,0 +1,189 @@
+"""
+Histogram Gradient Boosting Training
+Fits a HistGradientBoostingRegressor on the training features, using all
+cores, with item, category, day, meal period, weather and season as native
+categorical splits rather than ordinal thresholds on their LabelEncoder codes.
+The model is saved with the encoders it was trained with, so ml_service.py
+serves it through the flat tree engine like the other models, and it is
+compared with the current model on the same held-out split.
+
+Usage: python train_hist_gb.py [--restaurant RESTAURANT_3] [--refit-current] [--publish]
+"""
+
+import argparse
+import json
+import os
+import pickle
+import time
+import warnings
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from columnar_dataset import read_dataset
+from feature_encoding import CATEGORICAL_FEATURES, FEATURE_COLUMNS
+from feature_pipeline import CSV_PATH, load_split
+from memory_usage import PeakRSS
+from model_registry import REGISTRY_DIR, publish_version
+from tree_engine import FlatTreeEnsemble, latency_percentiles
+
+warnings.filterwarnings('ignore')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CURRENT_MODEL_PATH = os.path.join(BASE_DIR, 'models', 'waste_prediction_model_gb.pkl')
+OUTPUT_DIR = os.path.join(BASE_DIR, 'models', 'hist_gb')
+
+# HistGradientBoosting bins categorical values directly, so codes must stay below max_bins
+MAX_CATEGORIES = 255
+
+def categorical_mask(encoders):
+    """Features split as categories; ones with too many classes stay ordinal."""
+    mask = np.zeros(len(FEATURE_COLUMNS), dtype=bool)
+    for idx, col in enumerate(CATEGORICAL_FEATURES):
+        if len(encoders[col].classes_) <= MAX_CATEGORIES:
+            mask[idx] = True
+        else:
+            print(f"  {col} has {len(encoders[col].classes_)} classes; kept as an ordinal feature")
+    return mask
+
+def same_encoders(a, b):
+    return all(list(a[col].classes_) == list(b[col].classes_) for col in CATEGORICAL_FEATURES)
+
+def evaluate(model, X_test, y_test, repeats, fit_seconds=None):
+    """Accuracy, size and latency of a fitted model, served through the flat engine."""
+    flat = FlatTreeEnsemble.from_sklearn(model)
+    predictions = flat.predict(X_test)
+    start = time.perf_counter()
+    flat.predict(X_test)
+    batch_seconds = time.perf_counter() - start
+    sklearn_p50, sklearn_p99 = latency_percentiles(model.predict, X_test, repeats)
+    flat_p50, flat_p99 = latency_percentiles(flat.predict, X_test, repeats)
+    return {
+        'fitSeconds': None if fit_seconds is None else round(fit_seconds, 2),
+        'testR2': round(r2_score(y_test, predictions), 4),
+        'testMAE': round(mean_absolute_error(y_test, predictions), 3),
+        'testRMSE': round(float(np.sqrt(mean_squared_error(y_test, predictions))), 3),
+        'trees': flat.n_trees,
+        'nodes': len(flat.value),
+        'pickleBytes': len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+        'batchMs': round(batch_seconds * 1000, 1),
+        'singleRowMs': {
+            'sklearnP50': round(sklearn_p50, 4), 'sklearnP99': round(sklearn_p99, 4),
+            'flatP50': round(flat_p50, 4), 'flatP99': round(flat_p99, 4)
+        }
+    }
+
+def print_comparison(results, n_test):
+    names = list(results)
+    rows = [
+        ('fit time', lambda r: 'n/a' if r['fitSeconds'] is None else f"{r['fitSeconds']:.1f}s"),
+        ('test R²', lambda r: f"{r['testR2']:.4f}"),
+        ('test MAE', lambda r: f"{r['testMAE']:.3f}pp"),
+        ('test RMSE', lambda r: f"{r['testRMSE']:.3f}pp"),
+        ('trees / nodes', lambda r: f"{r['trees']} / {r['nodes']:,}"),
+        ('pickle size', lambda r: f"{r['pickleBytes'] / 1e6:.2f}MB"),
+        ('served p50 / p99', lambda r: f"{r['singleRowMs']['flatP50'] * 1000:.0f} / "
+                                       f"{r['singleRowMs']['flatP99'] * 1000:.0f}us"),
+        ('sklearn p50 / p99', lambda r: f"{r['singleRowMs']['sklearnP50'] * 1000:.0f} / "
+                                        f"{r['singleRowMs']['sklearnP99'] * 1000:.0f}us"),
+        (f'batch of {n_test:,}', lambda r: f"{r['batchMs']:.1f}ms"),
+    ]
+    print(f"\n{'':<20}" + ''.join(f"{name:>22}" for name in names))
+    for label, fmt in rows:
+        print(f"{label:<20}" + ''.join(f"{fmt(results[name]):>22}" for name in names))
+
+def train(args):
+    rows = None
+    output_dir = OUTPUT_DIR
+    if args.restaurant:
+        rows = (read_dataset(args.csv, columns=['restaurant_id'])['restaurant_id'] == args.restaurant).to_numpy()
+        if not rows.any():
+            raise SystemExit(f"No rows for {args.restaurant}")
+        output_dir = os.path.join(OUTPUT_DIR, args.restaurant)
+        print(f"Training on {args.restaurant}: {rows.sum():,} records")
+
+    X_train, X_test, y_train, y_test, encoders = load_split(args.csv, test_size=0.2, random_state=42, rows=rows)
+    X_train, X_test, y_train, y_test = (np.asarray(a) for a in (X_train, X_test, y_train, y_test))
+    print(f"Training: {len(X_train):,} | Test: {len(X_test):,}")
+
+    model = HistGradientBoostingRegressor(
+        max_iter=args.max_iter,
+        learning_rate=args.learning_rate,
+        max_leaf_nodes=args.max_leaf_nodes,
+        min_samples_leaf=args.min_samples_leaf,
+        categorical_features=categorical_mask(encoders),
+        random_state=42
+    )
+    print("Training Histogram Gradient Boosting model")
+    start = time.perf_counter()
+    with PeakRSS() as fit_memory:
+        model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    print(f"  {model.n_iter_} iterations in {fit_seconds:.1f}s, peak RSS {fit_memory}")
+
+    results = {}
+    # The encoders the current model was trained with are saved next to it
+    current_encoders = os.path.join(os.path.dirname(os.path.abspath(args.current)), 'feature_encoders.pkl')
+    if (os.path.exists(args.current) and os.path.exists(current_encoders)
+            and same_encoders(joblib.load(current_encoders), encoders)):
+        current = joblib.load(args.current)
+        current_fit = None
+        if args.refit_current:
+            print(f"Refitting {os.path.basename(args.current)} on the same split for timing")
+            start = time.perf_counter()
+            current = clone(current).fit(X_train, y_train)
+            current_fit = time.perf_counter() - start
+        if args.restaurant:
+            print("Note: the current model was trained on every restaurant and may have seen these test rows")
+        results['current'] = dict(evaluate(current, X_test, y_test, args.repeats, current_fit),
+                                  path=args.current, refit=bool(args.refit_current))
+    else:
+        print(f"Skipping the comparison: {args.current} is missing or was trained with other encoders")
+    results['histGradientBoosting'] = dict(evaluate(model, X_test, y_test, args.repeats, fit_seconds),
+                                           fitMemory=fit_memory.as_dict())
+    print_comparison(results, len(X_test))
+
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, 'waste_prediction_model_hgb.pkl')
+    encoder_path = os.path.join(output_dir, 'feature_encoders.pkl')
+    info_path = os.path.join(output_dir, 'model_info_hgb.pkl')
+    joblib.dump(model, model_path)
+    joblib.dump(encoders, encoder_path)
+    joblib.dump({
+        'features': FEATURE_COLUMNS,
+        'target': 'wastePercentage',
+        'algorithm': 'HistGradientBoosting',
+        'categoricalFeatures': [col for col, categorical in zip(FEATURE_COLUMNS, model.is_categorical_)
+                                if categorical],
+        'restaurant': args.restaurant,
+        'fitSeconds': round(fit_seconds, 2)
+    }, info_path)
+    with open(os.path.join(output_dir, 'hgb_report.json'), 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nModel saved: {model_path}")
+
+    if args.publish:
+        version = publish_version(REGISTRY_DIR, model_path, encoder_path, info_path, args.version)
+        print(f"Published {version} (now current)")
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train a histogram gradient boosting model with categorical splits')
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--restaurant', help='train on one restaurant_id only')
+    parser.add_argument('--max-iter', type=int, default=300,
+                        help='most boosting iterations; early stopping may use fewer')
+    parser.add_argument('--learning-rate', type=float, default=0.1)
+    parser.add_argument('--max-leaf-nodes', type=int, default=31)
+    parser.add_argument('--min-samples-leaf', type=int, default=20)
+    parser.add_argument('--current', default=CURRENT_MODEL_PATH,
+                        help='model to compare against, with its feature_encoders.pkl in the same directory')
+    parser.add_argument('--refit-current', action='store_true',
+                        help='refit the current model on the same split to time it (slow)')
+    parser.add_argument('--repeats', type=int, default=2000, help='single-row predictions timed per model')
+    parser.add_argument('--publish', action='store_true', help='publish the model to the registry')
+    parser.add_argument('--version')
+    train(parser.parse_args())
@@ -0,0 +1,405 @@
+"""
+Flattened Tree-Ensemble Inference
+Copies the trees of a fitted GradientBoostingRegressor, RandomForestRegressor
+or HistGradientBoostingRegressor into contiguous NumPy arrays and walks every
+tree for a whole batch at once, so serving does not go through the estimator's
+per-call validation and dispatch.
+"""
+
+import hashlib
+import json
+import numpy as np
+import os
+import time
+
+# Arrays written by FlatTreeEnsemble.save, one .npy file each
+ARRAY_NAMES = ('feature', 'threshold', 'children', 'value', 'roots')
+# Only present for models with categorical splits or learned missing-value directions
+OPTIONAL_ARRAY_NAMES = ('category_row', 'category_right', 'missing_right')
+
+# Categorical splits route codes 0-255 through a lookup row; the last slot is
+# used for missing, negative and out-of-range codes
+CATEGORY_SLOTS = 257
+MISSING_SLOT = CATEGORY_SLOTS - 1
+
+NEG_INF32 = np.float32(-np.inf)
+POS_INF32 = np.float32(np.inf)
+
+class FlatTreeEnsemble:
+    """Array-only copy of a fitted tree ensemble.
+
+    All trees share one node table. Leaves point to themselves, so every row
+    can be walked for exactly max_depth steps without checking for leaves.
+    """
+
+    # Rows are walked in blocks so the per-level temporaries stay cache sized
+    BLOCK_ROWS = 256
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth,
+                 base_score, scale, n_features, category_row=None, category_right=None,
+                 missing_right=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        # Largest float32 not above each threshold: for float32 inputs
+        # x <= threshold exactly when x <= threshold32
+        threshold32 = threshold.astype(np.float32)
+        too_high = threshold32.astype(np.float64) > threshold
+        threshold32[too_high] = np.nextafter(threshold32[too_high], np.float32(-np.inf))
+        self.threshold32 = threshold32
+        self.children_flat = children.ravel()
+        self.is_leaf = children[:, 0] == np.arange(len(children))
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.base_score = base_score
+        self.scale = scale
+        self.n_features = n_features
+        # Categorical nodes index a row of category_right (go right per code), others hold -1
+        self.category_row = category_row
+        self.category_right = category_right
+        # Nodes that send NaN right; without it NaN fails every > test and goes left
+        self.missing_right = missing_right
+        if category_row is not None:
+            # One flat lookup for every node: numeric nodes read an all-False
+            # row, so go_right = (x > threshold) | lookup needs no branching
+            self._category_base = np.where(category_row >= 0, (category_row + 1) * CATEGORY_SLOTS, 0)
+            self._category_flat = np.concatenate([np.zeros(CATEGORY_SLOTS, dtype=bool), category_right.ravel()])
+        self._fingerprint = None
+
+    @classmethod
+    def from_sklearn(cls, model):
+        if hasattr(model, '_predictors'):
+            return cls.from_hist_gradient_boosting(model)
+        estimators = model.estimators_
+        if hasattr(model, 'learning_rate'):
+            if estimators.ndim != 2 or estimators.shape[1] != 1:
+                raise ValueError('Only single-output gradient boosting regressors are supported')
+            trees = [est.tree_ for est in estimators[:, 0]]
+            scale = float(model.learning_rate)
+            if model.init_ == 'zero':
+                base_score = 0.0
+            elif hasattr(model.init_, 'constant_'):
+                base_score = float(np.ravel(model.init_.constant_)[0])
+            else:
+                raise ValueError(f'Unsupported init estimator: {type(model.init_).__name__}')
+        else:
+            trees = [est.tree_ for est in estimators]
+            scale = 1.0 / len(trees)
+            base_score = 0.0
+
+        return cls.from_trees(trees, base_score, scale, model.n_features_in_)
+
+    @classmethod
+    def from_trees(cls, trees, base_score, scale, n_features):
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        total = int(sizes.sum())
+
+        # Index arrays use intp so np.take never has to convert them
+        feature = np.zeros(total, dtype=np.intp)
+        threshold = np.full(total, np.inf, dtype=np.float64)
+        children = np.empty((total, 2), dtype=np.intp)
+        value = np.empty(total, dtype=np.float64)
+
+        for tree, offset in zip(trees, offsets):
+            nodes = slice(offset, offset + tree.node_count)
+            node_ids = np.arange(offset, offset + tree.node_count, dtype=np.intp)
+            is_leaf = tree.children_left == -1
+
+            feature[nodes] = np.where(is_leaf, 0, tree.feature)
+            threshold[nodes] = np.where(is_leaf, np.inf, tree.threshold)
+            children[nodes, 0] = np.where(is_leaf, node_ids, tree.children_left + offset)
+            children[nodes, 1] = np.where(is_leaf, node_ids, tree.children_right + offset)
+            value[nodes] = tree.value[:, 0, 0]
+
+        max_depth = max(tree.max_depth for tree in trees)
+        return cls(feature, threshold, children, value, offsets.astype(np.intp),
+                   max_depth, base_score, scale, n_features)
+
+    @classmethod
+    def from_hist_gradient_boosting(cls, model):
+        """Flatten a HistGradientBoostingRegressor, including categorical bitset splits."""
+        if model.loss not in ('squared_error', 'absolute_error', 'quantile'):
+            raise ValueError(f'Unsupported loss for a flat ensemble: {model.loss}')
+        if any(len(predictors) != 1 for predictors in model._predictors):
+            raise ValueError('Only single-output gradient boosting regressors are supported')
+        predictors = [predictors[0] for predictors in model._predictors]
+        known_bitsets, feature_map = model._bin_mapper.make_known_categories_bitsets()
+
+        sizes = np.array([len(predictor.nodes) for predictor in predictors])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        total = int(sizes.sum())
+        feature = np.zeros(total, dtype=np.intp)
+        threshold = np.full(total, np.inf, dtype=np.float64)
+        children = np.empty((total, 2), dtype=np.intp)
+        value = np.empty(total, dtype=np.float64)
+        missing_right = np.zeros(total, dtype=bool)
+        category_row = np.full(total, -1, dtype=np.intp)
+        category_right = []
+
+        codes = np.arange(MISSING_SLOT)
+        for predictor, offset in zip(predictors, offsets):
+            nodes = predictor.nodes
+            node_slice = slice(offset, offset + len(nodes))
+            node_ids = np.arange(offset, offset + len(nodes), dtype=np.intp)
+            is_leaf = nodes['is_leaf'].astype(bool)
+            is_categorical = nodes['is_categorical'].astype(bool) & ~is_leaf
+
+            feature[node_slice] = np.where(is_leaf, 0, nodes['feature_idx'])
+            threshold[node_slice] = np.where(is_leaf | is_categorical, np.inf, nodes['num_threshold'])
+            children[node_slice, 0] = np.where(is_leaf, node_ids, nodes['left'] + offset)
+            children[node_slice, 1] = np.where(is_leaf, node_ids, nodes['right'] + offset)
+            value[node_slice] = nodes['value']
+            missing_right[node_slice] = ~is_leaf & ~nodes['missing_go_to_left'].astype(bool)
+
+            # Categories in the node's left bitset go left, other known ones go
+            # right and unknown ones follow the missing-value direction
+            for node_id in np.flatnonzero(is_categorical):
+                node = nodes[node_id]
+                words = codes // 32
+                bits = codes % 32
+                go_left = (predictor.raw_left_cat_bitsets[node['bitset_idx']][words] >> bits) & 1
+                known = (known_bitsets[feature_map[node['feature_idx']]][words] >> bits) & 1
+                missing = not node['missing_go_to_left']
+                row = np.append(np.where(known.astype(bool), go_left == 0, missing), missing)
+                category_row[offset + node_id] = len(category_right)
+                category_right.append(row)
+
+        max_depth = int(max(predictor.nodes['depth'].max() for predictor in predictors))
+        base_score = float(np.ravel(model._baseline_prediction)[0])
+        return cls(feature, threshold, children, value, offsets.astype(np.intp), max_depth, base_score,
+                   1.0, model.n_features_in_,
+                   category_row=category_row if category_right else None,
+                   category_right=np.array(category_right, dtype=bool) if category_right else None,
+                   missing_right=missing_right if missing_right.any() else None)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """Load arrays written by save(); with mmap_mode they are mapped, not read."""
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.asarray(np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode))
+            for name in ARRAY_NAMES + OPTIONAL_ARRAY_NAMES
+            if name in ARRAY_NAMES or os.path.exists(os.path.join(directory, name + '.npy'))
+        }
+        flat = cls(**arrays, max_depth=meta['maxDepth'], base_score=meta['baseScore'],
+                   scale=meta['scale'], n_features=meta['nFeatures'])
+        flat._fingerprint = meta['fingerprint']
+        return flat
+
+    def save(self, directory, **extra_meta):
+        """Write the node arrays as uncompressed .npy files plus meta.json."""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES + OPTIONAL_ARRAY_NAMES:
+            if getattr(self, name) is not None:
+                np.save(os.path.join(directory, name + '.npy'), getattr(self, name))
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump(dict(extra_meta, maxDepth=int(self.max_depth), baseScore=self.base_score,
+                           scale=self.scale, nFeatures=int(self.n_features),
+                           fingerprint=self.fingerprint()), f, indent=2)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def fingerprint(self):
+        """Content hash of the flattened trees, used to tie derived artifacts to a model."""
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for array in (self.feature, self.threshold, self.children, self.value,
+                          self.category_row, self.category_right, self.missing_right):
+                if array is not None:
+                    digest.update(np.ascontiguousarray(array).tobytes())
+            digest.update(repr((self.base_score, self.scale, self.n_features)).encode())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def split_values(self, feature_index):
+        """Sorted float32 thresholds of every numeric split on one feature."""
+        splits = (self.feature == feature_index) & ~self.is_leaf
+        if self.category_row is not None:
+            splits &= self.category_row < 0
+        return np.unique(self.threshold32[splits])
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_rows, n_trees)."""
+        # sklearn casts features to float32 before comparing with the thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f'Expected input of shape (n, {self.n_features}), got {X.shape}')
+
+        if X.shape[0] <= self.BLOCK_ROWS:
+            return self._apply_block(X)
+        return np.concatenate([
+            self._apply_block(X[start:start + self.BLOCK_ROWS])
+            for start in range(0, X.shape[0], self.BLOCK_ROWS)
+        ])
+
+    def _routing(self, flat_x):
+        """Per-value inputs of _go_right, computed once per block: category slots and NaN flags."""
+        slots = missing = None
+        if self.category_row is not None:
+            # NaN fails both comparisons and lands in the missing slot
+            slots = np.where((flat_x >= 0) & (flat_x < MISSING_SLOT), flat_x, MISSING_SLOT).astype(np.intp)
+        if self.missing_right is not None:
+            missing = np.isnan(flat_x)
+            if not missing.any():
+                missing = None
+        return slots, missing
+
+    def _go_right(self, nodes, flat_x, x_index, slots, missing):
+        """Direction taken at each node by the value flat_x[x_index] reaching it."""
+        go_right = flat_x.take(x_index) > self.threshold32.take(nodes)
+        if slots is not None:
+            # Categorical nodes have an infinite threshold, so only the lookup can send them right
+            go_right |= self._category_flat.take(self._category_base.take(nodes) + slots.take(x_index))
+        if missing is not None:
+            go_right |= missing.take(x_index) & self.missing_right.take(nodes)
+        return go_right
+
+    def _apply_block(self, X):
+        n_rows = X.shape[0]
+        flat_x = np.ascontiguousarray(X).ravel()
+        slots, missing = self._routing(flat_x)
+        if n_rows == 1:
+            nodes, row_offsets = self.roots, None
+        else:
+            nodes = np.tile(self.roots, n_rows)
+            row_offsets = np.repeat(np.arange(n_rows, dtype=np.intp) * self.n_features, self.n_trees)
+
+        for _ in range(self.max_depth):
+            x_index = self.feature.take(nodes)
+            if row_offsets is not None:
+                x_index += row_offsets
+            go_right = self._go_right(nodes, flat_x, x_index, slots, missing)
+            nodes = self.children_flat.take(2 * nodes + go_right)
+        return nodes.reshape(n_rows, self.n_trees)
+
+    def predict(self, X):
+        leaves = self.apply(X)
+        return self.base_score + self.scale * self.value.take(leaves).sum(axis=1)
+
+    def step_function(self, row, feature_index):
+        """Prediction as a function of one feature with the rest of the row fixed.
+
+        Splits on other features follow the row, splits on feature_index branch
+        both ways, so each tree is walked once for every value of the feature.
+        Returns (breakpoints, values): the prediction for x is
+        values[np.searchsorted(breakpoints, np.float32(x))]. The feature must
+        only be split numerically.
+        """
+        if self.category_row is not None and (self.category_row[self.feature == feature_index] >= 0).any():
+            raise ValueError(f'Feature {feature_index} has categorical splits')
+        x = np.asarray(row, dtype=np.float32).ravel()
+        slots, missing = self._routing(x)
+        nodes = self.roots
+        lo = np.full(self.n_trees, -np.inf, dtype=np.float32)
+        hi = np.full(self.n_trees, np.inf, dtype=np.float32)
+
+        for _ in range(self.max_depth):
+            feature = self.feature.take(nodes)
+            threshold = self.threshold32.take(nodes)
+            go_right = self._go_right(nodes, x, feature, slots, missing)
+            # Fixed splits send the whole interval one way; leaves go "left" to themselves
+            split = np.where(feature == feature_index, threshold,
+                             np.where(go_right, NEG_INF32, POS_INF32))
+
+            left_hi = np.minimum(hi, split)
+            right_lo = np.maximum(lo, split)
+            left_ok = lo < left_hi
+            right_ok = right_lo < hi
+
+            branch = 2 * nodes
+            nodes = self.children_flat.take(np.concatenate([branch[left_ok], branch[right_ok] + 1]))
+            lo = np.concatenate([lo[left_ok], right_lo[right_ok]])
+            hi = np.concatenate([left_hi[left_ok], hi[right_ok]])
+
+        leaves, leaf_lo, leaf_hi = nodes, lo, hi
+
+        breakpoints = np.unique(np.concatenate([leaf_lo, leaf_hi]))
+        breakpoints = breakpoints[np.isfinite(breakpoints)]
+
+        # Each leaf covers the slots of every x with lo < x <= hi
+        first = np.searchsorted(breakpoints, leaf_lo, side='right')
+        last = np.searchsorted(breakpoints, leaf_hi, side='left')
+        leaf_values = self.value.take(leaves)
+        size = len(breakpoints) + 2
+        totals = (np.bincount(first, weights=leaf_values, minlength=size)
+                  - np.bincount(last + 1, weights=leaf_values, minlength=size))
+        values = self.base_score + self.scale * np.cumsum(totals)[:len(breakpoints) + 1]
+        return breakpoints, values
+
+    def sweep(self, row, feature_index, candidates):
+        """Predict the row for every candidate value of one feature."""
+        breakpoints, values = self.step_function(row, feature_index)
+        candidates = np.asarray(candidates, dtype=np.float32)
+        return values[np.searchsorted(breakpoints, candidates)]
+
+def load_flat_model(path):
+    """Load a joblib-pickled sklearn ensemble and flatten it."""
+    import joblib
+    return FlatTreeEnsemble.from_sklearn(joblib.load(path))
+
+def latency_percentiles(fn, rows, repeats):
+    """(p50, p99) milliseconds of fn called on one row at a time."""
+    timings = []
+    for i in range(repeats):
+        row = rows[i % len(rows):i % len(rows) + 1]
+        start = time.perf_counter()
+        fn(row)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+def compare_with_sklearn(model, X, repeats=500):
+    flat = FlatTreeEnsemble.from_sklearn(model)
+    X = np.asarray(X, dtype=np.float64)
+
+    max_diff = np.max(np.abs(flat.predict(X) - model.predict(X)))
+    sk_p50, sk_p99 = latency_percentiles(model.predict, X, repeats)
+    flat_p50, flat_p99 = latency_percentiles(flat.predict, X, repeats)
+
+    start = time.perf_counter()
+    model.predict(X)
+    sk_batch = time.perf_counter() - start
+    start = time.perf_counter()
+    flat.predict(X)
+    flat_batch = time.perf_counter() - start
+
+    print(f"  Trees: {flat.n_trees} | Nodes: {len(flat.value):,} | Max depth: {flat.max_depth}")
+    print(f"  Max abs difference vs model.predict: {max_diff:.2e}")
+    print(f"  Single row  - sklearn p50: {sk_p50:.3f}ms p99: {sk_p99:.3f}ms | "
+          f"flat p50: {flat_p50:.3f}ms p99: {flat_p99:.3f}ms")
+    print(f"  Batch of {len(X):,} - sklearn: {sk_batch * 1000:.1f}ms | flat: {flat_batch * 1000:.1f}ms")
+    return max_diff
+
+if __name__ == '__main__':
+    import warnings
+    import joblib
+    import pandas as pd
+    warnings.filterwarnings('ignore')
+
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    CSV_PATH = os.path.join(BASE_DIR, 'data', 'restaurant_waste_expanded.csv')
+    ENCODER_PATH = os.path.join(BASE_DIR, 'models', 'feature_encoders.pkl')
+    MODEL_PATHS = [
+        os.path.join(BASE_DIR, 'models', 'waste_prediction_model_gb.pkl'),
+        os.path.join(BASE_DIR, 'models', 'waste_prediction_model.pkl'),
+    ]
+
+    from feature_encoding import MONTH_SEASONS, CompiledEncoders
+    encoders = CompiledEncoders.from_encoders(joblib.load(ENCODER_PATH))
+
+    sample = pd.read_csv(CSV_PATH, nrows=200000).sample(2000, random_state=42)
+    sample['month'] = pd.to_datetime(sample['date']).dt.month
+    sample['season'] = sample['month'].map(MONTH_SEASONS)
+    X, _ = encoders.encode_rows(sample.to_dict('records'))
+
+    for path in MODEL_PATHS:
+        if not os.path.exists(path):
+            print(f"Skipping {os.path.basename(path)} (not found)")
+            continue
+        print(f"\n{os.path.basename(path)}")
+        compare_with_sklearn(joblib.load(path), X)
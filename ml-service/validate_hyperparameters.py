@@ -2,62 +2,14 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split, GridSearchCV
 from sklearn.ensemble import GradientBoostingRegressor
-import os
 import time
 
-def load_synthetic_data():
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    DATA_DIR = os.path.join(BASE_DIR, 'data')
-    CSV_PATH = os.path.join(DATA_DIR, 'restaurant_waste_expanded.csv')
-    
-    print(f"Loading dataset from: {CSV_PATH}")
-    df = pd.read_csv(CSV_PATH)
-    print(f"Loaded {len(df):,} records\n")
-    
-    return df
-
-def prepare_features(df):
-    from sklearn.preprocessing import LabelEncoder
-    
-    # Encode categorical variables
-    encoders = {}
-    categorical_columns = ['itemName', 'category', 'dayOfWeek', 'mealPeriod', 'weather']
-    
-    for col in categorical_columns:
-        encoders[col] = LabelEncoder()
-        df[col + '_encoded'] = encoders[col].fit_transform(df[col])
-    
-    df['specialEvent_encoded'] = df['specialEvent'].map({True: 1, False: 0})
-    
-    # Extract temporal features
-    df['date'] = pd.to_datetime(df['date'])
-    df['month'] = df['date'].dt.month
-    df['season'] = df['date'].dt.month.map({
-        12: 'Winter', 1: 'Winter', 2: 'Winter',
-        3: 'Spring', 4: 'Spring', 5: 'Spring',
-        6: 'Summer', 7: 'Summer', 8: 'Summer',
-        9: 'Autumn', 10: 'Autumn', 11: 'Autumn'
-    })
-    encoders['season'] = LabelEncoder()
-    df['season_encoded'] = encoders['season'].fit_transform(df['season'])
-    
-    # Define features
-    feature_columns = [
-        'itemName_encoded', 'category_encoded', 'dayOfWeek_encoded',
-        'mealPeriod_encoded', 'weather_encoded', 'season_encoded',
-        'specialEvent_encoded', 'month', 'preparedQuantity'
-    ]
-    
-    X = df[feature_columns]
-    y = df['wastePercentage']
-    
-    return X, y
+from feature_pipeline import load_features
 
 def main():
      
     # Load and prepare data
-    df = load_synthetic_data()
-    X, y = prepare_features(df)
+    X, y, _ = load_features()
     
     print("Using 10% subset for grid search (faster validation)")
     X_subset, _, y_subset, _ = train_test_split(